@@ -4,10 +4,30 @@ from __future__ import print_function
 
 from importlib import reload
 
+from . import geometry
+
+reload(geometry)
+
+from . import components
+
+reload(components)
+
+from . import symmetry
+
+reload(symmetry)
+
+from . import curve_sampling
+
+reload(curve_sampling)
+
 from . import utils
 
 reload(utils)
 
+from . import skin
+
+reload(skin)
+
 from . import mouth
 
 reload(mouth)
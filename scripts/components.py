@@ -0,0 +1,115 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+from maya import cmds
+
+from . import geometry
+
+
+class ComponentSet(object):
+    """Components of one node stored as an index array
+
+    Args:
+        node (str): node owning the components
+        kind (str): component label, "vtx", "e", "f", "cv", ...
+        indices (array-like): component indices, order is kept
+    """
+
+    def __init__(self, node, kind, indices):
+        self.node = node
+        self.kind = kind
+        self.indices = np.asarray(indices, dtype=np.int64).ravel()
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __repr__(self):
+        return "ComponentSet({!r}, {!r}, {} indices)".format(
+            self.node, self.kind, len(self)
+        )
+
+    @classmethod
+    def from_strings(cls, components):
+        """Build component sets from Maya component strings
+
+        Wildcards are resolved by Maya into compressed ranges, the strings
+        are never flattened.
+
+        Return:
+            list: ComponentSet per node and kind, in order of appearance
+        """
+        if isinstance(components, str):
+            components = [components]
+        components = list(components)
+        if any("*" in x for x in components):
+            components = cmds.ls(components)
+
+        grouped, _ = geometry.parse_components(components)
+
+        return [
+            cls(node, kind, indices)
+            for (node, kind), indices in grouped.items()
+        ]
+
+    @classmethod
+    def from_selection(cls, kind=None):
+        selection = cmds.ls(orderedSelection=True) or []
+        sets = cls.from_strings(selection)
+        if kind:
+            sets = [x for x in sets if x.kind == kind]
+        return sets
+
+    @classmethod
+    def all(cls, node, kind):
+        """Every component of a node, one set per shape
+
+        Return:
+            list: ComponentSet per shape, one empty set if there is none
+        """
+        sets = cls.from_strings("{}.{}[*]".format(node, kind))
+        return sets or [cls(node, kind, [])]
+
+    def ranges(self):
+        """Consecutive index runs as (start, end) pairs, end included"""
+        if not len(self.indices):
+            return []
+        breaks = np.flatnonzero(np.diff(self.indices) != 1) + 1
+        starts = self.indices[np.concatenate(([0], breaks))]
+        ends = self.indices[np.concatenate((breaks - 1, [len(self) - 1]))]
+        return list(zip(starts.tolist(), ends.tolist()))
+
+    def to_strings(self):
+        """Compressed Maya component strings, "node.kind[a:b]" """
+        strings = []
+        for start, end in self.ranges():
+            index = str(start) if start == end else "{}:{}".format(start, end)
+            strings.append("{}.{}[{}]".format(self.node, self.kind, index))
+        return strings
+
+    def select(self, add=False):
+        cmds.select(self.to_strings(), add=add)
+
+
+def get_indices(components):
+    """Flat index list from component sets or component strings"""
+    if isinstance(components, ComponentSet):
+        return components.indices.tolist()
+    if isinstance(components, str):
+        components = [components]
+
+    indices = []
+    for each in components:
+        if not isinstance(each, ComponentSet):
+            each = ComponentSet.from_strings(each)[0]
+        indices.extend(each.indices.tolist())
+
+    return indices
+
+
+def to_strings(component_sets):
+    strings = []
+    for component_set in component_sets:
+        strings.extend(component_set.to_strings())
+    return strings
@@ -0,0 +1,127 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+
+import maya.api.OpenMaya as om
+import numpy as np
+
+from . import geometry
+
+SAMPLES_PER_SPAN = 32
+
+_ARC_LENGTH_TABLES = {}
+
+
+class ArcLengthTable(object):
+    """Cumulative length of a curve at densely sampled parameters"""
+
+    def __init__(self, parameters, lengths):
+        self.parameters = parameters
+        self.lengths = lengths
+
+    @property
+    def length(self):
+        return float(self.lengths[-1])
+
+    def get_parameters(self, distances):
+        """Curve parameters at distances from the start, vectorized"""
+        return np.interp(distances, self.lengths, self.parameters)
+
+    def get_uniform_parameters(self, count):
+        """Parameters of count points evenly spaced along the curve"""
+        return self.get_parameters(np.linspace(0.0, self.length, count))
+
+
+def get_curve_data(curve):
+    """Get the world space CVs, full knot vector and degree of a curve
+
+    Maya knots miss the first and last knot of the standard definition,
+    they are duplicated, their value is never used by the evaluation.
+    """
+    dag_path = geometry.get_dag_path(curve)
+    if dag_path.apiType() == om.MFn.kTransform:
+        dag_path.extendToShape()
+    fn = om.MFnNurbsCurve(dag_path)
+
+    cvs = np.array(fn.cvPositions(om.MSpace.kWorld), dtype=np.float64)
+    knots = np.array(fn.knots(), dtype=np.float64)
+    knots = np.concatenate(([knots[0]], knots, [knots[-1]]))
+
+    return cvs[:, :3], knots, fn.degree
+
+
+def evaluate(cvs, knots, degree, parameters):
+    """Evaluate B-spline positions with a vectorized de Boor algorithm
+
+    Return:
+        np.ndarray: N x 3 positions
+    """
+    parameters = np.asarray(parameters, dtype=np.float64)
+    knots = np.asarray(knots, dtype=np.float64)
+    spans = np.searchsorted(knots, parameters, side="right") - 1
+    spans = np.clip(spans, degree, len(cvs) - 1)
+
+    points = cvs[spans[:, None] + np.arange(-degree, 1)]
+    for r in range(1, degree + 1):
+        for j in range(degree, r - 1, -1):
+            left = knots[spans + j - degree]
+            right = knots[spans + j + 1 - r]
+            span = right - left
+            alpha = np.divide(
+                parameters - left,
+                span,
+                out=np.zeros_like(span),
+                where=span != 0,
+            )[:, None]
+            previous = points[:, j - 1]
+            points[:, j] = previous + alpha * (points[:, j] - previous)
+
+    return points[:, degree]
+
+
+def build_arc_length_table(cvs, knots, degree):
+    spans = len(cvs) - degree
+    start, end = knots[degree], knots[len(cvs)]
+    parameters = np.linspace(start, end, spans * SAMPLES_PER_SPAN + 1)
+    points = evaluate(cvs, knots, degree, parameters)
+
+    segments = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    lengths = np.concatenate(([0.0], np.cumsum(segments)))
+
+    return ArcLengthTable(parameters, lengths)
+
+
+def get_arc_length_table(curve):
+    """Get the arc length table of a curve, built once per curve data
+
+    Tables are kept in memory keyed by the hash of the CVs and knots.
+
+    Return:
+        ArcLengthTable
+    """
+    cvs, knots, degree = get_curve_data(curve)
+    digest = hashlib.sha1(cvs.tobytes())
+    digest.update(knots.tobytes())
+    key = "{}_{}".format(digest.hexdigest(), degree)
+
+    if key not in _ARC_LENGTH_TABLES:
+        _ARC_LENGTH_TABLES[key] = build_arc_length_table(cvs, knots, degree)
+
+    return _ARC_LENGTH_TABLES[key]
+
+
+def get_uniform_parameters(curve, count):
+    """Parameters of count points evenly spaced by arc length on a curve"""
+    return get_arc_length_table(curve).get_uniform_parameters(count).tolist()
+
+
+def get_parameter_at_ratio(curve, ratio):
+    """Parameter at a ratio of the curve length, 0 start and 1 end"""
+    table = get_arc_length_table(curve)
+    return float(table.get_parameters(ratio * table.length))
+
+
+def clear_cache():
+    _ARC_LENGTH_TABLES.clear()
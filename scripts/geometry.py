@@ -0,0 +1,207 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import re
+
+import maya.api.OpenMaya as om
+import numpy as np
+from maya import cmds
+
+COMPONENT_PATTERN = re.compile(
+    r"^(?P<node>[^\[\]]+)\.(?P<kind>\w+)\[(?P<start>\d+)(?::(?P<end>\d+))?\]$"
+)
+
+_TOPOLOGY_HASHES = {}
+_TOPOLOGY_CALLBACKS = {}
+
+
+def get_curve_points(curve, world_space=False):
+    """Get the evaluated CV positions of a curve in one call
+
+    Return:
+        np.ndarray: N x 3 positions
+    """
+    space = {"worldSpace": True} if world_space else {"objectSpace": True}
+    points = cmds.xform(
+        "{}.cv[*]".format(curve), query=True, translation=True, **space
+    )
+    return np.reshape(points, (-1, 3))
+
+
+def set_curve_points(curve, points):
+    """Set the local CV positions of a curve in one call"""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    plug = "{}.cv[0:{}]".format(curve, len(points) - 1)
+    cmds.setAttr(plug, *points.ravel().tolist())
+
+
+def get_dag_path(node):
+    selection = om.MSelectionList()
+    selection.add(node)
+    return selection.getDagPath(0)
+
+
+def get_plug(plug):
+    selection = om.MSelectionList()
+    selection.add(plug)
+    return selection.getPlug(0)
+
+
+def get_mesh_fn(mesh):
+    dag_path = get_dag_path(mesh)
+    if dag_path.apiType() == om.MFn.kTransform:
+        dag_path.extendToShape()
+    return om.MFnMesh(dag_path)
+
+
+def get_points(mesh, indices=None, world_space=False):
+    """Get vertex positions of a mesh in one call
+
+    Args:
+        mesh (str): mesh transform or shape
+        indices (array-like, optional): vertex indices, all if not provided
+        world_space (bool): query in world space instead of object space
+
+    Return:
+        np.ndarray: N x 3 positions
+    """
+    space = om.MSpace.kWorld if world_space else om.MSpace.kObject
+    points = get_mesh_fn(mesh).getPoints(space)
+    points = np.array(points, dtype=np.float64).reshape(-1, 4)[:, :3]
+    if indices is None:
+        return points
+    return points[np.asarray(indices, dtype=np.int64)]
+
+
+def get_faces_centers(mesh, indices=None, world_space=True):
+    """Get the center of faces, average of their vertices
+
+    Args:
+        mesh (str): mesh transform or shape
+        indices (array-like, optional): face indices, all if not provided
+        world_space (bool): query in world space instead of object space
+
+    Return:
+        np.ndarray: N x 3 positions
+    """
+    points = get_points(mesh, world_space=world_space)
+    counts, connects = get_topology(mesh)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    centers = np.add.reduceat(points[connects], offsets) / counts[:, None]
+    if indices is None:
+        return centers
+    return centers[np.asarray(indices, dtype=np.int64)]
+
+
+def parse_components(components):
+    """Group component strings by node and kind without flattening
+
+    Args:
+        components (list): strings like "mesh.vtx[3]" or "mesh.f[2:10]"
+
+    Return:
+        tuple:
+            dict of {(node, kind): np.ndarray of indices} in selection order,
+            list of the strings which are not single-indexed components.
+    """
+    grouped = {}
+    others = []
+    for component in components:
+        match = COMPONENT_PATTERN.match(component)
+        if not match:
+            others.append(component)
+            continue
+        start = int(match.group("start"))
+        end = int(match.group("end") or start)
+        key = (match.group("node"), match.group("kind"))
+        grouped.setdefault(key, []).append(np.arange(start, end + 1))
+
+    indices = {key: np.concatenate(ranges) for key, ranges in grouped.items()}
+    return indices, others
+
+
+def get_topology(mesh):
+    """Get the face description of a mesh
+
+    Return:
+        tuple:
+            np.ndarray of vertex count per face,
+            np.ndarray of face vertex indices.
+    """
+    counts, connects = get_mesh_fn(mesh).getVertices()
+    return (
+        np.array(counts, dtype=np.int64),
+        np.array(connects, dtype=np.int64),
+    )
+
+
+def get_edges(mesh):
+    """Get the vertex pair of every edge of a mesh
+
+    Return:
+        np.ndarray: E x 2 vertex indices
+    """
+    iterator = om.MItMeshEdge(get_dag_path(mesh))
+    edges = np.empty((iterator.count(), 2), dtype=np.int64)
+    while not iterator.isDone():
+        index = iterator.index()
+        edges[index] = iterator.vertexId(0), iterator.vertexId(1)
+        iterator.next()
+
+    return edges
+
+
+def get_topology_hash(mesh):
+    counts, connects = get_topology(mesh)
+    digest = hashlib.sha1(counts.tobytes())
+    digest.update(connects.tobytes())
+    return digest.hexdigest()
+
+
+def get_cached_topology_hash(mesh):
+    """Get the topology hash of a mesh, computed again only after a change
+
+    Hashes are kept per shape node, a polyTopologyChanged callback on the
+    shape drops its hash. See clear_topology_hashes.
+    """
+    dag_path = get_dag_path(mesh)
+    if dag_path.apiType() == om.MFn.kTransform:
+        dag_path.extendToShape()
+    handle = om.MObjectHandle(dag_path.node())
+    key = handle.hashCode()
+
+    # Hash codes of deleted shapes can be given to new ones
+    registered = _TOPOLOGY_CALLBACKS.get(key)
+    if registered and not registered[0].isAlive():
+        _remove_topology_callback(key)
+        registered = None
+
+    if key in _TOPOLOGY_HASHES:
+        return _TOPOLOGY_HASHES[key]
+
+    if not registered:
+        callback = om.MPolyMessage.addPolyTopologyChangedCallback(
+            dag_path.node(), lambda *args: _TOPOLOGY_HASHES.pop(key, None)
+        )
+        _TOPOLOGY_CALLBACKS[key] = (handle, callback)
+    _TOPOLOGY_HASHES[key] = get_topology_hash(dag_path.fullPathName())
+
+    return _TOPOLOGY_HASHES[key]
+
+
+def _remove_topology_callback(key):
+    _TOPOLOGY_HASHES.pop(key, None)
+    handle, callback = _TOPOLOGY_CALLBACKS.pop(key)
+    try:
+        om.MMessage.removeCallback(callback)
+    except RuntimeError:
+        pass
+
+
+def clear_topology_hashes():
+    """Forget the cached topology hashes and remove their callbacks"""
+    for key in list(_TOPOLOGY_CALLBACKS):
+        _remove_topology_callback(key)
+    _TOPOLOGY_HASHES.clear()
@@ -2,10 +2,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import re
+import hashlib
+import json
+import time
 
 from maya import cmds
 
+from . import components
+from . import geometry
 from . import utils
 
 DEFORMERS_STACK = {
@@ -32,9 +36,28 @@ DEFORMERS_STACK = {
         "M_noseFollow_cluster": None,
     }
 }
+STACK_SIDES = ("L", "R")
+SETUP_STEPS_NODE = "mouth_setup_steps"
+SETUP_STEPS_ATTR = "stepInputs"
 
 
-def update_inside_mouth_setup(edges=None, jaw_joint="M_jaw_main_jnt"):
+def update_inside_mouth_setup(
+    edges=None, jaw_joint="M_jaw_main_jnt", force=False
+):
+    """Run the inside mouth setup steps whose inputs changed
+
+    Each step records a hash of its inputs on SETUP_STEPS_NODE, a rerun
+    only executes the steps with different inputs, or depending on a step
+    executed before them. Inputs are read with the controllers reset.
+
+    Args:
+        edges (list): the 2 edges of the mouth rivet
+        jaw_joint (str): jaw joint driving the teeth and tongue
+        force (bool): run every step, even unchanged ones
+
+    Return:
+        dict: duration in seconds of the executed steps
+    """
     if not edges:
         edges = cmds.ls(selection=True, flatten=True) or None
     if not edges or len(edges) != 2:
@@ -42,12 +65,162 @@ def update_inside_mouth_setup(edges=None, jaw_joint="M_jaw_main_jnt"):
             "Please select exactly 2 edges to create a rivet.", noContext=True
         )
 
-    update_teeth_tongue_follow_jaw(edges, jaw_joint)
-    scale_tongue_ikfk()
-    add_teeth_bend()
+    # Steps rebuilt on top of the follow jaw targets depend on it
+    steps = [
+        (
+            "follow_jaw",
+            lambda: get_follow_jaw_inputs(edges, jaw_joint),
+            lambda: follow_jaw_step(edges, jaw_joint),
+            [],
+        ),
+        (
+            "scale_tongue_ikfk",
+            get_scale_tongue_inputs,
+            scale_tongue_ikfk,
+            ["follow_jaw"],
+        ),
+        ("teeth_bend", get_teeth_bend_inputs, add_teeth_bend, ["follow_jaw"]),
+    ]
+
+    # Hashed transforms are rest ones
+    utils.reset_all_controllers(user_attr=False)
+
+    recorded = get_setup_steps_inputs()
+    timings = {}
+    for name, get_inputs, run, dependencies in steps:
+        rerun = force or set(dependencies) & set(timings)
+        if not rerun and recorded.get(name) == _hash_inputs(get_inputs()):
+            print(f"Skipped {name}, inputs unchanged")
+            continue
+
+        start = time.perf_counter()
+        run()
+        timings[name] = time.perf_counter() - start
+
+        # Inputs are hashed after the run, the steps edit the targets
+        recorded[name] = _hash_inputs(get_inputs())
+        set_setup_steps_inputs(recorded)
+
+    for name, duration in timings.items():
+        print(f"  {name}: {duration:.3f}s")
+
+    return timings
+
+
+def follow_jaw_step(edges, jaw_joint="M_jaw_main_jnt"):
+    """Build the jaw follow, or update the existing rivet
+
+    The driver of an existing rivet is matched again to the jaw, the
+    rivet must be wired to the same jaw joint.
+    """
+    plugs = cmds.ls("*.mouth_rivet")
+    if not plugs:
+        update_teeth_tongue_follow_jaw(edges, jaw_joint)
+        return
+
+    rivet = plugs[0].split(".")[0]
+    jaw_pmas = cmds.listConnections(
+        f"{jaw_joint}.translateX",
+        skipConversionNodes=True,
+        type="plusMinusAverage",
+    )
+    linked = {
+        x.split(".")[0] for x in get_rivet_links(rivet)["plusMinusAverage"]
+    }
+    if not linked.intersection(jaw_pmas or []):
+        cmds.error(
+            f"{rivet} does not follow {jaw_joint}, delete the rivet setup "
+            "to build it on another jaw joint.",
+            noContext=True,
+        )
+
+    update_rivet_edges(edges, jaw_joint)
+
+
+def get_follow_jaw_inputs(edges, jaw_joint="M_jaw_main_jnt"):
+    blendshape = "jaw_blendShape"
+    edges = [
+        [x.node, x.indices.tolist()]
+        for x in components.ComponentSet.from_strings(edges)
+    ]
+    targets = []
+    for i in range(3):
+        plug = (
+            f"{blendshape}.inputTarget[0].inputTargetGroup[{i}]"
+            ".inputTargetItem[6000].inputPointsTarget"
+        )
+        points = cmds.getAttr(plug) if cmds.objExists(plug) else None
+        targets.append(_hash_inputs(points))
+
+    return {
+        "edges": edges,
+        "jaw_joint": jaw_joint,
+        # Read with the controllers reset, posing the jaw does not change
+        # the inputs, moving its rest transform does
+        "jaw_matrix": cmds.xform(
+            jaw_joint, query=True, matrix=True, worldSpace=True
+        ),
+        "targets": targets,
+    }
+
+
+def get_scale_tongue_inputs():
+    return {
+        "joints": cmds.ls("tongue_*_jnt") + cmds.ls("tongue_*_bind"),
+        "ik_ctrls": cmds.ls("M_tongue_ik_*_ctrl"),
+    }
+
+
+def get_teeth_bend_inputs():
+    inputs = {}
+    for mode in ["lower", "upper"]:
+        bend_ref = f"{mode}Teeth_bendYHandle"
+        inputs[mode] = {
+            "mesh": utils.get_children(f"{mode}Teeth_geo_grp")[-1],
+            "bend_ref": cmds.xform(
+                bend_ref, query=True, matrix=True, worldSpace=True
+            ),
+        }
+
+    return inputs
 
 
-def update_rivet_edges(edges=None):
+def get_setup_steps_inputs():
+    plug = f"{SETUP_STEPS_NODE}.{SETUP_STEPS_ATTR}"
+    if not cmds.objExists(plug):
+        return {}
+    return json.loads(cmds.getAttr(plug) or "{}")
+
+
+def set_setup_steps_inputs(data):
+    if not cmds.objExists(SETUP_STEPS_NODE):
+        cmds.createNode("network", name=SETUP_STEPS_NODE)
+        cmds.addAttr(
+            SETUP_STEPS_NODE, longName=SETUP_STEPS_ATTR, dataType="string"
+        )
+    cmds.setAttr(
+        f"{SETUP_STEPS_NODE}.{SETUP_STEPS_ATTR}",
+        json.dumps(data, sort_keys=True),
+        type="string",
+    )
+
+
+def _hash_inputs(data):
+    # Rounded floats, the scene values are not bit stable
+    def normalize(value):
+        if isinstance(value, float):
+            return round(value, 6)
+        if isinstance(value, (list, tuple)):
+            return [normalize(x) for x in value]
+        if isinstance(value, dict):
+            return {k: normalize(v) for k, v in value.items()}
+        return value
+
+    text = json.dumps(normalize(data), sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def update_rivet_edges(edges=None, jaw_joint=None):
     # Checks
     if not edges:
         edges = cmds.ls(selection=True, flatten=True) or None
@@ -73,23 +246,22 @@ def update_rivet_edges(edges=None):
     set_edges_rivet(edges, rivet)
 
     cmds.parent(driver, rivet)
+    if jaw_joint:
+        cmds.matchTransform(driver, jaw_joint)
 
     # Edit pluMinusAverage values
-    pma = cmds.listConnections(
-        f"{rivet}.message", plugs=True, type="plusMinusAverage"
-    )
-    for node_plug in pma:
-        node, node_attr = node_plug.split(".")
-        node_attr_value = cmds.getAttr(f"{node}.{node_attr}")
-        match = re.search(r"\[(\d+)\]", node_attr_value)
-        number = int(match.group(1))
-        node_attr_edit = node_attr_value.replace(
-            f"[{number}]", f"[{number + 1}]"
-        )
+    values_data = {}
+    for node_plug in get_rivet_links(rivet)["plusMinusAverage"]:
+        # Stored as "input3D[n].input3D", the parent is the compound
+        node_attr_value = cmds.getAttr(node_plug)
+        compound = node_attr_value.rsplit(".", 1)[0]
+        node = node_plug.split(".")[0]
+
+        values = cmds.getAttr(f"{node}.{compound}")[0]
+        plug = f"{node}.{utils.increment_multi_index(compound)}"
+        values_data[plug] = [-value for value in values]
 
-        for axis in "xyz":
-            value = cmds.getAttr(f"{node}.{node_attr_value}{axis}")
-            cmds.setAttr(f"{node}.{node_attr_edit}{axis}", -value)
+    utils.set_plugs(values_data)
 
     apply_tongue_crv_delta()
 
@@ -105,6 +277,11 @@ def add_teeth_bend():
         ctrl = f"M_{mode}Teeth_main_ctrl"
         attr_name = "curvatureX"
 
+        # Replace the bend of a previous run
+        if cmds.objExists(name):
+            handle = cmds.listConnections(f"{name}.matrix") or []
+            cmds.delete(handle, name)
+
         # Create the bend
         deformer = utils.create_deformer(
             name=name, meshes=[mesh], deformer_type="bend"
@@ -123,8 +300,11 @@ def add_teeth_bend():
 
         # Connect curvature
         cmds.select(ctrl)
-        cmds.addAttr(ctrl, longName=attr_name, keyable=True)
-        cmds.connectAttr(f"{ctrl}.{attr_name}", f"{bend}.curvature")
+        if not cmds.attributeQuery(attr_name, node=ctrl, exists=True):
+            cmds.addAttr(ctrl, longName=attr_name, keyable=True)
+        cmds.connectAttr(
+            f"{ctrl}.{attr_name}", f"{bend}.curvature", force=True
+        )
 
 
 def apply_tongue_crv_delta():
@@ -158,94 +338,211 @@ def apply_tongue_crv_delta():
 
         cmds.setAttr(jaw_pos[i][0], jaw_pos[i][1])
 
-        # Delta
-        tmp_delta = utils.duplicate_node(crv_neutral, "trash_grp", "delta")[0]
-        bs = cmds.blendShape(tmp, crv_ref, tmp_delta)[0]
-        cmds.setAttr(f"{bs}.{tmp}", 1)
-        cmds.setAttr(f"{bs}.{crv_ref}", -1)
-        cmds.delete(tmp_delta, constructionHistory=True)
-
-        bs = cmds.blendShape(tmp_delta, target)[0]
-        cmds.setAttr(f"{bs}.{tmp_delta}", 1)
-        cmds.delete(target, constructionHistory=True)
-
-        cmds.delete(tmp_delta)
+        set_curve_delta(target, tmp, crv_ref, crv_neutral)
         cmds.delete(target)
 
         utils.reset_all_controllers(user_attr=False)
 
 
-def make_edges_rivet(edges, input_mesh_plug, name="mouth"):
-    # Node names
-    node_names = {
-        "crvfe": [f"rivet_{name}_crvfe_0{i + 1}" for i in range(2)],
-        "loft": f"rivet_{name}_loft",
-        "posi": f"rivet_{name}_posi",
-        "vector": f"rivet_{name}_vprdt",
-        "fbfmx": f"rivet_{name}_fbfmx",
-        "rivet": f"rivet_{name}_loc",
+def set_curve_delta(target, curve, reference, neutral):
+    """Set target CVs to curve - reference + neutral, without temp nodes"""
+    points = geometry.get_curve_points(curve)
+    points -= geometry.get_curve_points(reference)
+    points += geometry.get_curve_points(neutral)
+    geometry.set_curve_points(target, points)
+
+
+def _set_curve_delta_with_blendshapes(target, curve, reference, neutral):
+    # Former implementation, kept as benchmark reference
+    tmp_delta = cmds.duplicate(neutral)[0]
+    bs = cmds.blendShape(curve, reference, tmp_delta)[0]
+    cmds.setAttr(f"{bs}.{curve}", 1)
+    cmds.setAttr(f"{bs}.{reference}", -1)
+    cmds.delete(tmp_delta, constructionHistory=True)
+
+    bs = cmds.blendShape(tmp_delta, target)[0]
+    cmds.setAttr(f"{bs}.{tmp_delta}", 1)
+    cmds.delete(target, constructionHistory=True)
+
+    cmds.delete(tmp_delta)
+
+
+def benchmark_tongue_crv_delta(cv_count=20, targets=3):
+    """Compare the nodes created by both curve delta methods
+
+    Runs on stand-in curves, the mouth setup is not needed.
+
+    Return:
+        dict: created node count per method
+    """
+    points = [(i, 0, 0) for i in range(cv_count)]
+    neutral = cmds.curve(point=points, name="benchmark_neutral_crv")
+    reference = cmds.curve(point=points, name="benchmark_reference_crv")
+    curve = cmds.curve(
+        point=[(i, 1, i % 2) for i in range(cv_count)],
+        name="benchmark_target_crv",
+    )
+
+    methods = {
+        "blendShapes": _set_curve_delta_with_blendshapes,
+        "arrays": set_curve_delta,
     }
+    results = {}
+    for label, method in methods.items():
+        # duplicated curves stand for the regenerated targets
+        target_curves = [cmds.duplicate(neutral)[0] for _ in range(targets)]
+
+        start = time.perf_counter()
+        with utils.count_created_nodes() as created:
+            for target in target_curves:
+                method(target, curve, reference, neutral)
+        duration = time.perf_counter() - start
+
+        cmds.delete(target_curves)
+        results[label] = len(created)
+        print(
+            "{}: {} nodes created, {:.3f}s".format(
+                label, results[label], duration
+            )
+        )
 
-    # Create nodes
-    crvfe_nodes = [
-        cmds.createNode("curveFromMeshEdge", name=name)
-        for name in node_names["crvfe"]
-    ]
-    loft = cmds.createNode("loft", name=node_names["loft"])
-    posi = cmds.createNode("pointOnSurfaceInfo", name=node_names["posi"])
-    vector = cmds.createNode("vectorProduct", name=node_names["vector"])
-    fbfmx = cmds.createNode("fourByFourMatrix", name=node_names["fbfmx"])
-    rivet = cmds.spaceLocator(name=node_names["rivet"])[0]
-
-    cmds.parent(rivet, utils.GROUPS_DATA["rivet"])
-
-    # Set node attributes
-    cmds.setAttr(f"{loft}.uniform", 1)
-    cmds.setAttr(f"{posi}.parameterU", 0.5)
-    cmds.setAttr(f"{posi}.parameterV", 0.5)
-    cmds.setAttr(f"{posi}.turnOnPercentage", 1)
-    cmds.setAttr(f"{vector}.operation", 2)
-
-    # Connect nodes
-    for i, crvfe in enumerate(crvfe_nodes):
-        cmds.connectAttr(input_mesh_plug, f"{crvfe}.inputMesh")
-        cmds.connectAttr(f"{crvfe}.outputCurve", f"{loft}.inputCurve[{i}]")
-
-    cmds.connectAttr(f"{loft}.outputSurface", f"{posi}.inputSurface")
-
-    attributes = ["p", "n", "tv"]
-    indices = "301"
-    for y, (attr, row) in enumerate(zip(attributes, indices)):
-        for i, axis in enumerate("xyz"):
-            cmds.connectAttr(f"{posi}.{attr}{axis}", f"{fbfmx}.i{row}{i}")
-            if y == 0:
-                cmds.connectAttr(f"{vector}.o{axis}", f"{fbfmx}.i2{i}")
-                continue
-            cmds.connectAttr(f"{posi}.{attr}{axis}", f"{vector}.i{y}{axis}")
-
-    cmds.connectAttr(f"{fbfmx}.output", f"{rivet}.offsetParentMatrix")
-
-    # Add message connections
-    for crvfe in crvfe_nodes:
-        attr_name = "rivetLink"
-        if not cmds.attributeQuery(attr_name, node=crvfe, exists=True):
-            cmds.addAttr(crvfe, longName=attr_name, dataType="string")
-        cmds.setAttr(
-            f"{crvfe}.{attr_name}", node_names["rivet"], type="string"
+    cmds.delete(neutral, reference, curve)
+
+    return results
+
+
+def make_edges_rivet(edges, input_mesh_plug, name="mouth"):
+    return make_edges_rivets([edges], input_mesh_plug, [name])[0]
+
+
+def make_edges_rivets(edge_pairs, input_mesh_plug, names):
+    """Create rivets between pairs of edges of one mesh
+
+    All the rivets read their edges from a single curveFromMeshEdge, rivet i
+    uses the edgeIndex and outputCurve entries 2i and 2i+1. Its rivetLink[i]
+    message tags the entries so set_edges_rivet can retarget them.
+
+    Args:
+        edge_pairs (list): 2 edges per rivet, strings or ComponentSets
+        input_mesh_plug (str): mesh plug driving the rivets
+        names (list): name per rivet
+
+    Return:
+        list: rivet locators
+    """
+    crvfe = cmds.createNode(
+        "curveFromMeshEdge", name=f"rivet_{names[0]}_crvfe", skipSelect=True
+    )
+    cmds.connectAttr(input_mesh_plug, f"{crvfe}.inputMesh")
+    attr_name = "rivetLink"
+    cmds.addAttr(
+        crvfe, longName=attr_name, attributeType="message", multi=True
+    )
+
+    rivets = []
+    for index, (edges, name) in enumerate(zip(edge_pairs, names)):
+        loft = cmds.createNode(
+            "loft", name=f"rivet_{name}_loft", skipSelect=True
         )
+        posi = cmds.createNode(
+            "pointOnSurfaceInfo", name=f"rivet_{name}_posi", skipSelect=True
+        )
+        vector = cmds.createNode(
+            "vectorProduct", name=f"rivet_{name}_vprdt", skipSelect=True
+        )
+        fbfmx = cmds.createNode(
+            "fourByFourMatrix", name=f"rivet_{name}_fbfmx", skipSelect=True
+        )
+        rivet = cmds.spaceLocator(name=f"rivet_{name}_loc")[0]
+
+        # Set node attributes
+        cmds.setAttr(f"{loft}.uniform", 1)
+        cmds.setAttr(f"{posi}.parameterU", 0.5)
+        cmds.setAttr(f"{posi}.parameterV", 0.5)
+        cmds.setAttr(f"{posi}.turnOnPercentage", 1)
+        cmds.setAttr(f"{vector}.operation", 2)
+
+        # Connect nodes
+        plugs_data = {
+            f"{loft}.outputSurface": f"{posi}.inputSurface",
+            f"{fbfmx}.output": f"{rivet}.offsetParentMatrix",
+        }
+        for i in range(2):
+            plugs_data[f"{crvfe}.outputCurve[{index * 2 + i}]"] = (
+                f"{loft}.inputCurve[{i}]"
+            )
+
+        attributes = ["p", "n", "tv"]
+        indices = "301"
+        for y, (attr, row) in enumerate(zip(attributes, indices)):
+            for i, axis in enumerate("xyz"):
+                targets = [f"{fbfmx}.i{row}{i}"]
+                if y == 0:
+                    plugs_data[f"{vector}.o{axis}"] = f"{fbfmx}.i2{i}"
+                else:
+                    targets.append(f"{vector}.i{y}{axis}")
+                plugs_data[f"{posi}.{attr}{axis}"] = targets
+
+        utils.connect_plugs(plugs_data)
+
+        # Add message connection
+        cmds.connectAttr(f"{rivet}.message", f"{crvfe}.{attr_name}[{index}]")
+
+        add_rivet_id(rivet, name)
+        set_edges_rivet(edges, rivet)
+        rivets.append(rivet)
+
+    return cmds.parent(rivets, utils.GROUPS_DATA["rivet"])
+
+
+def make_uv_rivets(uvs, input_mesh_plug, names, orig_mesh_plug=None):
+    """Create rivets at UV coordinates of one mesh from a single uvPin
+
+    Args:
+        uvs (list): (u, v) coordinates per rivet
+        input_mesh_plug (str): mesh plug driving the rivets
+        names (list): name per rivet
+        orig_mesh_plug (str, optional): undeformed mesh plug, used by
+            the uvPin to compute a stable tangent space
+
+    Return:
+        list: rivet locators
+    """
+    pin = cmds.createNode(
+        "uvPin", name=f"rivet_{names[0]}_uvPin", skipSelect=True
+    )
+    cmds.connectAttr(input_mesh_plug, f"{pin}.deformedGeometry")
+    if orig_mesh_plug:
+        cmds.connectAttr(orig_mesh_plug, f"{pin}.originalGeometry")
+
+    rivets = []
+    for i, ((u, v), name) in enumerate(zip(uvs, names)):
+        rivet = cmds.spaceLocator(name=f"rivet_{name}_loc")[0]
+        cmds.setAttr(f"{pin}.coordinate[{i}]", u, v)
         cmds.connectAttr(
-            f"{rivet}.message", f"{crvfe}.{attr_name}", force=True
+            f"{pin}.outputMatrix[{i}]", f"{rivet}.offsetParentMatrix"
         )
+        add_rivet_id(rivet, name)
+        rivets.append(rivet)
+
+    return cmds.parent(rivets, utils.GROUPS_DATA["rivet"])
+
+
+def make_vertices_rivets(vertices, input_mesh_plug, names, **kwargs):
+    """Create uvPin rivets at the first UV of each vertex"""
+    uvs = []
+    for vertex in vertices:
+        uv = cmds.polyListComponentConversion(vertex, toUV=True)
+        uvs.append(cmds.polyEditUV(cmds.ls(uv, flatten=True)[0], query=True))
+
+    return make_uv_rivets(uvs, input_mesh_plug, names, **kwargs)
 
-    # Add indentifier attribute
+
+def add_rivet_id(rivet, name):
     id_name = f"{name}_rivet"
     cmds.addAttr(rivet, longName=id_name, dataType="string")
     cmds.setAttr(f"{rivet}.{id_name}", "rivetID", type="string", lock=True)
 
-    set_edges_rivet(edges, rivet)
-
-    return rivet
-
 
 def update_teeth_tongue_follow_jaw(edges=None, jaw_joint="M_jaw_main_jnt"):
     # Checks
@@ -310,47 +607,35 @@ def update_teeth_tongue_follow_jaw(edges=None, jaw_joint="M_jaw_main_jnt"):
             type="plusMinusAverage",
         )[0].split(".", 1)
 
-        match = re.search(r"\[(\d+)\]", pma_attr)
-        number = int(match.group(1))
-        pma_attr_increment = pma_attr.replace(f"[{number}]", f"[{number + 1}]")
+        pma_attr_increment = utils.increment_multi_index(pma_attr)
         pma_tongue = cmds.createNode(
             "plusMinusAverage", name=f"tongue_jawHook{attr}_sum"
         )
 
-        for axis in "xyz":
-            # Connect plusMinusAverage
+        # Connect plusMinusAverage
+        dmx_plug = f"{dmx}.output{attr.capitalize()}"
+        dmx_values = cmds.getAttr(dmx_plug)[0]
+        plugs_data = {}
+        values_data = {}
+        for axis, dmx_value in zip("xyz", dmx_values):
+            plugs_data[f"{dmx_plug}{axis.upper()}"] = [
+                f"{pma}.{pma_attr[:-1]}{axis}"
+                for pma in [pma_teeth, pma_tongue]
+            ]
+            plugs_data[f"{pma_tongue}.output3D{axis}"] = (
+                f"M_tongue_joint_hook.{attr}{axis.upper()}"
+            )
             for pma in [pma_teeth, pma_tongue]:
-                cmds.connectAttr(
-                    f"{dmx}.output{attr.capitalize()}{axis.upper()}",
-                    f"{pma}.{pma_attr[:-1]}{axis}",
-                    force=True,
-                )
-
-                dmx_value = cmds.getAttr(
-                    f"{dmx}.output{attr.capitalize()}{axis.upper()}"
-                )
-                cmds.setAttr(
-                    f"{pma}.{pma_attr_increment[:-1]}{axis}",
-                    -dmx_value,
-                )
+                plug = f"{pma}.{pma_attr_increment[:-1]}{axis}"
+                values_data[plug] = -dmx_value
 
-            cmds.connectAttr(
-                f"{pma_tongue}.output3D{axis}",
-                f"M_tongue_joint_hook.{attr}{axis.upper()}",
-            )
+        utils.connect_plugs(plugs_data)
+        utils.set_plugs(values_data)
 
         # Reset remap
-        remaps = cmds.listConnections(pma_teeth, plugs=True, type="remapValue")
-        for remap_plug in remaps:
-            remap = remap_plug.split(".")[0]
-            for att in ["inputMin", "inputMax", "outputMin", "outputMax"]:
-                cmds.setAttr(f"{remap}.{att}", 0)
-
-            for i, plug in enumerate(cmds.ls(f"{remap}.value[*]")):
-                value = 0
-                if i == len(cmds.ls(f"{remap}.value[*]")) - 1:
-                    value = 1
-                cmds.setAttr(f"{plug}.value_FloatValue", value)
+        remaps = cmds.listConnections(pma_teeth, type="remapValue") or []
+        for remap in dict.fromkeys(remaps):
+            utils.reset_remap(remap)
 
         # Add message connections
         attr_name = "get"
@@ -369,52 +654,223 @@ def scale_tongue_ikfk():
     joints = cmds.ls("tongue_*_jnt") + cmds.ls("tongue_*_bind")
     ik_ctrls = cmds.ls("M_tongue_ik_*_ctrl")
     loc_plug = "M_move_locator.inverseMatrix"
-    joints_number = []
-    numbers = []
-
-    for jnt in joints:
-        match = re.search(r"\_(\d+)\_", jnt)
-        number = match.group(1)
-        joints_number.append(number)
-        if number in numbers:
-            continue
-        numbers.append(number)
 
-    div = len(numbers) / len(ik_ctrls)
-    round_div = round(div)
+    bins = utils.bin_segments(joints, len(ik_ctrls))
+    for ctrl, ctrl_joints in zip(ik_ctrls, bins):
+        # Replace the nodes of a previous run, _mmx and _dmx are legacy names
+        previous = cmds.ls(
+            f"{ctrl}_multMatrix",
+            f"{ctrl}_decomposeMatrix",
+            f"{ctrl}_mmx",
+            f"{ctrl}_dmx",
+        )
+        if previous:
+            cmds.delete(previous)
+
+        nodes = utils.create_nodes(["multMatrix", "decomposeMatrix"], ctrl)
+        mmx = nodes["mult"]
+        dmx = nodes["decompose"]
+
+        plugs_data = {
+            f"{ctrl}.worldMatrix[0]": f"{mmx}.matrixIn[0]",
+            loc_plug: f"{mmx}.matrixIn[1]",
+            f"{mmx}.matrixSum": f"{dmx}.inputMatrix",
+        }
+        for axis in "XYZ":
+            plugs_data[f"{dmx}.outputScale{axis}"] = [
+                f"{jnt}.scale{axis}" for jnt in ctrl_joints
+            ]
+        utils.connect_plugs(plugs_data)
 
-    for i, ctrl in enumerate(ik_ctrls):
-        start_idx = i * round_div
-        end_idx = start_idx + round_div
-        end_idx = min(end_idx, len(numbers))
 
-        dmx = cmds.createNode("decomposeMatrix", name=f"{ctrl}_dmx")
-        mmx = cmds.createNode("multMatrix", name=f"{ctrl}_mmx")
+def get_rivet_links(rivet):
+    """Get the plugs tagged by the message of a rivet, in one query
 
-        cmds.connectAttr(f"{ctrl}.worldMatrix[0]", f"{mmx}.matrixIn[0]")
-        cmds.connectAttr(loc_plug, f"{mmx}.matrixIn[1]")
-        cmds.connectAttr(f"{mmx}.matrixSum", f"{dmx}.inputMatrix")
+    Return:
+        dict: {node type: [plugs]} for curveFromMeshEdge and
+            plusMinusAverage nodes
+    """
+    links = {"curveFromMeshEdge": [], "plusMinusAverage": []}
+    plugs = cmds.listConnections(f"{rivet}.message", plugs=True) or []
+    if not plugs:
+        return links
 
-        for num in numbers[start_idx:end_idx]:
-            jnt_idxs = [
-                index
-                for index, value in enumerate(joints_number)
-                if value == num
-            ]
-            for y in jnt_idxs:
-                for axis in "XYZ":
-                    cmds.connectAttr(
-                        f"{dmx}.outputScale{axis}",
-                        f"{joints[y]}.scale{axis}",
-                        force=True,
-                    )
+    nodes = cmds.ls([plug.split(".")[0] for plug in plugs], showType=True)
+    types = dict(zip(nodes[::2], nodes[1::2]))
+
+    for plug in plugs:
+        node_type = types.get(plug.split(".")[0])
+        if node_type in links:
+            links[node_type].append(plug)
+
+    return links
+
+
+def validate_rivet_links(rivet):
+    """Check the message connections of a mouth rivet
+
+    Return:
+        bool: True if the rivet drives its edges and its 4 pma nodes
+    """
+    links = get_rivet_links(rivet)
+    errors = []
+    if len(links["curveFromMeshEdge"]) not in (1, 2):
+        errors.append("curveFromMeshEdge")
+    if len(links["plusMinusAverage"]) != 4:
+        errors.append("plusMinusAverage")
+
+    for node_type in errors:
+        cmds.warning(
+            f"{rivet} has {len(links[node_type])} {node_type} links",
+            noContext=True,
+        )
+
+    return not errors
 
 
 def set_edges_rivet(edges, rivet):
-    crvfe_nodes = cmds.listConnections(
-        f"{rivet}.message", type="curveFromMeshEdge"
+    plugs = (
+        cmds.listConnections(
+            f"{rivet}.message", type="curveFromMeshEdge", plugs=True
+        )
+        or []
     )
-    for node, edge in zip(crvfe_nodes, edges):
-        match = re.search(r"\[(\d+)\]", edge)
-        number = int(match.group(1))
-        cmds.setAttr(f"{node}.edgeIndex[0]", number)
+    indices = components.get_indices(edges)
+
+    # Rivets built by make_edges_rivets share one node, the rivetLink index
+    # gives their pair of edgeIndex entries
+    if len(plugs) == 1:
+        match = utils.MULTI_INDEX_PATTERN.match(plugs[0])
+        first = int(match.group(2)) * 2 if match else 0
+        node = plugs[0].split(".")[0]
+        for i, number in enumerate(indices):
+            cmds.setAttr(f"{node}.edgeIndex[{first + i}]", number)
+        return
+
+    for plug, number in zip(plugs, indices):
+        cmds.setAttr(f"{plug.split('.')[0]}.edgeIndex[0]", number)
+
+
+def resolve_deformers_stack(stack=DEFORMERS_STACK, sides=STACK_SIDES):
+    """Expand the "{}" side templates of a deformers stack
+
+    Return:
+        dict: {mesh: {deformer: settings}} in evaluation order
+    """
+    resolved = {}
+    for mesh, deformers in stack.items():
+        resolved[mesh] = {}
+        for name, settings in deformers.items():
+            names = [name.format(x) for x in sides] if "{}" in name else [name]
+            for each in names:
+                resolved[mesh][each] = settings
+
+    return resolved
+
+
+def get_deformers_stack(mesh):
+    """List the deformers of a mesh in evaluation order, in one query"""
+    history = cmds.listHistory(mesh, pruneDagObjects=True) or []
+    deformers = cmds.ls(history, type="geometryFilter") or []
+    ignored = set(cmds.ls(history, type="tweak") or [])
+    return [x for x in reversed(deformers) if x not in ignored]
+
+
+def diff_deformers_stack(mesh, expected):
+    """Compare the live deformers of a mesh with the expected ones
+
+    Args:
+        mesh (str): deformed mesh
+        expected (list): deformer names in evaluation order
+
+    Return:
+        dict:
+            missing: expected deformers not found on the mesh,
+            extra: deformers of the mesh not expected,
+            swaps: reorderDeformers pairs sorting the expected deformers,
+                missing ones are counted as added on top of the stack.
+    """
+    live = get_deformers_stack(mesh)
+    missing = [x for x in expected if x not in live]
+
+    # History also lists the deformers of upstream meshes
+    shape = utils.get_shape(mesh)
+    extra = [
+        x
+        for x in live
+        if x not in expected
+        and shape in (cmds.deformer(x, query=True, geometry=True) or [])
+    ]
+
+    order = [x for x in live if x in expected] + missing
+    swaps = []
+    for i, name in enumerate(expected):
+        if order[i] == name:
+            continue
+        j = order.index(name)
+        swaps.append((order[i], name))
+        order[i], order[j] = order[j], order[i]
+
+    return {"missing": missing, "extra": extra, "swaps": swaps}
+
+
+def create_stack_deformer(mesh, name, settings=None):
+    """Create a deformer of a stack, skinClusters use their settings"""
+    if not name.endswith("skinCluster"):
+        return utils.create_deformer(name=name, meshes=[mesh])
+
+    settings = settings or {}
+    joints = list(settings.get("joints", []))
+    if settings.get("use_hierarchy"):
+        joints += (
+            cmds.listRelatives(joints, allDescendents=True, type="joint") or []
+        )
+    deformer = cmds.skinCluster(
+        joints, mesh, name=name, **utils.SKINCLUSTER_SETTINGS
+    )
+    cmds.setAttr(f"{deformer[0]}.envelope", settings.get("envelope", 1))
+
+    return deformer
+
+
+def apply_deformers_stack(
+    stack=DEFORMERS_STACK, dry_run=False, remove_extra=False
+):
+    """Update the meshes deformers to match a deformers stack
+
+    Only the missing deformers are created, then the stack is reordered.
+
+    Args:
+        stack (dict): {mesh: {deformer: settings}}, "{}" stands for sides
+        dry_run (bool): only print and return the differences
+        remove_extra (bool): remove the deformers not in the stack
+
+    Return:
+        dict: differences per mesh, see diff_deformers_stack
+    """
+    report = {}
+    for mesh, deformers in resolve_deformers_stack(stack).items():
+        expected = list(deformers)
+        diff = diff_deformers_stack(mesh, expected)
+        report[mesh] = diff
+
+        print(f"{mesh}:")
+        for key, values in diff.items():
+            print(f"  {key}: {values if values else '-'}")
+
+        if dry_run:
+            continue
+
+        for name in diff["missing"]:
+            create_stack_deformer(mesh, name, deformers[name])
+
+        if remove_extra:
+            shape = utils.get_shape(mesh)
+            for name in diff["extra"]:
+                cmds.deformer(name, edit=True, remove=True, geometry=shape)
+
+        # New deformers are not always added on top, read the stack again
+        for first, second in diff_deformers_stack(mesh, expected)["swaps"]:
+            cmds.reorderDeformers(first, second, mesh)
+
+    return report
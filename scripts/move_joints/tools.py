@@ -5,6 +5,8 @@ from __future__ import print_function
 import json
 import os
 
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
 import maya.cmds as cmds
 import stim
 
@@ -13,69 +15,139 @@ from .. import utils
 LOG = stim.get_logger(__name__)
 
 
-def get_meshes_influenced_by_joint(joint):
-    if not cmds.objExists(joint):
-        cmds.warning(f"No match found in the scene for '{joint}'.")
-        return None
+class InfluenceIndex(object):
+    """Scene skinClusters indexed by influence, built in one pass
 
-    # Get joint hierarchy
-    joint_hierarchy = (
-        cmds.listRelatives(joint, allDescendents=True, type="joint") or []
-    )
-    joint_hierarchy.append(joint)
-
-    meshes_shapes = []
-    for jnt in joint_hierarchy:
-        skin_clusters = cmds.listConnections(jnt, type="skinCluster") or []
-        for skin_cluster in skin_clusters:
-            mesh_shapes = (
-                cmds.skinCluster(skin_cluster, query=True, geometry=True) or []
-            )
-            meshes_shapes.extend(mesh_shapes)
+    Every skinCluster is read once through the API for its influences and
+    output geometries, the joint hierarchy comes from the joints long
+    paths. Queries are answered from the index without Maya calls.
+    """
+
+    def __init__(self):
+        self.influence_clusters = {}
+        self.cluster_influences = {}
+        self.cluster_geometries = {}
+        self.geometry_clusters = {}
+        self.joint_children = {}
+        self.joints = set()
+        self.build()
+
+    def build(self):
+        paths = {}
+        iterator = om.MItDag(om.MItDag.kDepthFirst, om.MFn.kJoint)
+        while not iterator.isDone():
+            path = iterator.getPath()
+            paths[path.fullPathName()] = path.partialPathName()
+            iterator.next()
+
+        self.joints = set(paths.values())
+        for full_path, joint in paths.items():
+            parent = full_path.rsplit("|", 1)[0]
+            while parent and parent not in paths:
+                parent = parent.rsplit("|", 1)[0]
+            if parent:
+                self.joint_children.setdefault(paths[parent], []).append(joint)
+
+        iterator = om.MItDependencyNodes(om.MFn.kSkinClusterFilter)
+        while not iterator.isDone():
+            fn = oma.MFnSkinCluster(iterator.thisNode())
+            cluster = fn.name()
+            influences = [x.partialPathName() for x in fn.influenceObjects()]
+
+            geometries = []
+            for i in range(fn.numOutputConnections()):
+                path = fn.getPathAtIndex(fn.indexForOutputConnection(i))
+                path.pop()
+                geometries.append(path.partialPathName())
+
+            self.cluster_influences[cluster] = influences
+            self.cluster_geometries[cluster] = geometries
+            for influence in influences:
+                self.influence_clusters.setdefault(influence, set()).add(
+                    cluster
+                )
+            for geometry in geometries:
+                self.geometry_clusters.setdefault(geometry, []).append(cluster)
+
+            iterator.next()
+
+    def get_joint_hierarchy(self, joint):
+        """The joint and all its descendant joints"""
+        hierarchy = []
+        stack = [joint]
+        while stack:
+            jnt = stack.pop()
+            hierarchy.append(jnt)
+            stack.extend(self.joint_children.get(jnt, []))
+
+        return hierarchy
+
+    def get_meshes(self, joint):
+        """Meshes deformed by the joint or one of its descendants"""
+        clusters = set()
+        for jnt in self.get_joint_hierarchy(joint):
+            clusters.update(self.influence_clusters.get(jnt, ()))
+
+        meshes = set()
+        for cluster in clusters:
+            meshes.update(self.cluster_geometries[cluster])
+
+        return sorted(meshes)
+
+    def get_data(self, joint):
+        """See get_data_from_joint"""
+        return {
+            mesh: {
+                cluster: list(self.cluster_influences[cluster])
+                for cluster in self.geometry_clusters[mesh]
+            }
+            for mesh in self.get_meshes(joint)
+        }
+
+    def remove_clusters(self, clusters):
+        """Forget deleted skinClusters"""
+        for cluster in clusters:
+            for influence in self.cluster_influences.pop(cluster, []):
+                self.influence_clusters.get(influence, set()).discard(cluster)
+            for geometry in self.cluster_geometries.pop(cluster, []):
+                geometry_clusters = self.geometry_clusters[geometry]
+                geometry_clusters.remove(cluster)
+                if not geometry_clusters:
+                    del self.geometry_clusters[geometry]
+
+
+def get_meshes_influenced_by_joint(joint, index=None):
+    """Get the meshes deformed by a joint hierarchy
+
+    Args:
+        joint (str): root joint of the hierarchy
+        index (InfluenceIndex, optional): built from the scene if not provided
 
-    # Remove instances of the same mesh
-    meshes_shapes = list(set(meshes_shapes))
+    Return:
+        list: mesh transforms
+    """
+    if index is None:
+        index = InfluenceIndex()
+    if joint not in index.joints:
+        cmds.warning(f"No match found in the scene for '{joint}'.")
+        return None
 
-    return [utils.get_parent(shape) for shape in meshes_shapes]
+    return index.get_meshes(joint)
 
 
-def get_data_from_joint(joint):
+def get_data_from_joint(joint, index=None):
     """
     return: dict = {'mesh': {skinCluster: ['jnt1', 'jnt2', 'jnt3', ...]}}
     """
-    joint_data_dict = {}
-
-    meshes = get_meshes_influenced_by_joint(joint=joint)
-    for mesh in meshes:
-        if not mesh:
-            cmds.warning(f"No meshes found to be connected to '{joint}'.")
-            continue
-        try:
-            history = cmds.listHistory(mesh, pruneDagObjects=True) or []
-            skin_clusters = [
-                node
-                for node in history
-                if cmds.nodeType(node) == "skinCluster"
-            ]
-
-            skin_cluster_dict = {}
-            if not skin_clusters:
-                print(f"No skinClusters found for {mesh}")
-                return {{}}
-
-            for skin_cluster in skin_clusters:
-                joints = cmds.skinCluster(
-                    skin_cluster,
-                    query=True,
-                    influence=True,
-                    weightedInfluence=False,
-                )
-                skin_cluster_dict[skin_cluster] = joints
-
-            joint_data_dict[mesh] = skin_cluster_dict
+    if index is None:
+        index = InfluenceIndex()
+    if joint not in index.joints:
+        cmds.warning(f"No match found in the scene for '{joint}'.")
+        return {}
 
-        except Exception as e:
-            print(e)
+    joint_data_dict = index.get_data(joint)
+    if not joint_data_dict:
+        cmds.warning(f"No meshes found to be connected to '{joint}'.")
 
     return joint_data_dict
 
@@ -114,8 +186,8 @@ def create_locator_hierarchy(source, parent_locator=None, first_loc=None):
     return first_loc
 
 
-def unbind_skinclusters(joint):
-    joint_data_dict = get_data_from_joint(joint=joint)
+def unbind_skinclusters(joint, index=None):
+    joint_data_dict = get_data_from_joint(joint=joint, index=index)
 
     processed_clusters = []
     meshes = list(joint_data_dict.keys())
@@ -126,6 +198,9 @@ def unbind_skinclusters(joint):
             cmds.skinCluster(skin_cluster, edit=True, unbindKeepHistory=True)
             processed_clusters.append(skin_cluster)
 
+    if index is not None:
+        index.remove_clusters(processed_clusters)
+
     string_value = "{}_customData_tmp".format(joint)
     stored_data = {}
     if cmds.optionVar(exists=string_value):
@@ -237,8 +312,8 @@ def build_joint_hierarchy_from_locators(locator, parent_joint=None):
     return joint_node
 
 
-def export_skincluster_data_from_joint(joint, directory):
-    joint_data_dict = get_data_from_joint(joint=joint)
+def export_skincluster_data_from_joint(joint, directory, index=None):
+    joint_data_dict = get_data_from_joint(joint=joint, index=index)
     filepath = os.path.join(
         directory, "{}_related_skinClusters_data.json".format(joint)
     )
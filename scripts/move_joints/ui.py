@@ -234,8 +234,9 @@ class MoveJointsWindow(QtWidgets.QWidget):
 
     def unbind_button_clicked(self):
         try:
+            index = tools.InfluenceIndex()
             for joint in self.joints:
-                tools.unbind_skinclusters(joint=joint)
+                tools.unbind_skinclusters(joint=joint, index=index)
         except Exception as e:
             print(e)
 
@@ -256,16 +257,17 @@ class MoveJointsWindow(QtWidgets.QWidget):
     def export_button_clicked(self):
         directory = self.path_line.text()
         try:
+            index = tools.InfluenceIndex()
             for joint in self.joints:
-                meshes = tools.get_meshes_influenced_by_joint(joint)
-                for mesh in meshes:
+                meshes = tools.get_meshes_influenced_by_joint(joint, index)
+                for mesh in meshes or []:
                     utils.export_skinning_weights(
                         mesh=mesh, directory=directory
                     )
                     print("Skinning weights exported for: {}".format(mesh))
 
                 tools.export_skincluster_data_from_joint(
-                    directory=directory, joint=joint
+                    directory=directory, joint=joint, index=index
                 )
 
         except Exception as e:
@@ -275,6 +277,7 @@ class MoveJointsWindow(QtWidgets.QWidget):
         try:
             directory = self.path_line.text()
             joints = self.joints
+            index = tools.InfluenceIndex()
             for joint in joints:
                 if not joint:
                     print("Please select a joint in 'Baase Joint' field.")
@@ -285,28 +288,10 @@ class MoveJointsWindow(QtWidgets.QWidget):
                     )
                     continue
 
-                meshes = []
-                joint_hierarchy = cmds.listRelatives(
-                    joint, allDescendents=True, type="joint"
-                )
-                for jnt in joint_hierarchy:
-                    skinclusters = (
-                        cmds.listConnections(jnt, type="skinCluster") or []
-                    )
-                    for skincluster in skinclusters:
-                        mesh_shapes = (
-                            cmds.skinCluster(
-                                skincluster, query=True, geometry=True
-                            )
-                            or []
-                        )
-
-                        meshes.extend(mesh_shapes)
-
-                meshes = list(set(meshes))
-                for mesh in meshes:
+                meshes = tools.get_meshes_influenced_by_joint(joint, index)
+                for mesh in meshes or []:
                     utils.import_skinning_weights(
-                        mesh=utils.get_parent(mesh), directory=directory
+                        mesh=mesh, directory=directory
                     )
 
         except Exception as e:
@@ -349,8 +334,12 @@ class MoveJointsWindow(QtWidgets.QWidget):
                 tools.import_skincluster_data_from_joint(
                     joint=joint, directory=directory
                 )
-                meshes = tools.get_meshes_influenced_by_joint(joint=joint)
-                for mesh in meshes:
+
+            # The import recreates skinClusters, index them afterwards
+            index = tools.InfluenceIndex()
+            for joint in joints:
+                meshes = tools.get_meshes_influenced_by_joint(joint, index)
+                for mesh in meshes or []:
                     utils.import_skinning_weights(
                         mesh=mesh, directory=directory
                     )
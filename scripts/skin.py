@@ -0,0 +1,323 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import tempfile
+import time
+
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
+import numpy as np
+from maya import cmds
+from ngSkinTools2 import api
+
+from . import geometry
+from . import symmetry
+from . import utils
+
+WEIGHTS_PLUGIN = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "skin_weights_command.py"
+)
+
+
+def get_skincluster_fn(skincluster):
+    selection = om.MSelectionList()
+    selection.add(skincluster)
+    return oma.MFnSkinCluster(selection.getDependNode(0))
+
+
+def _get_all_vertices(dag_path):
+    fn = om.MFnSingleIndexedComponent()
+    component = fn.create(om.MFn.kMeshVertComponent)
+    fn.setCompleteData(om.MFnMesh(dag_path).numVertices)
+    return component
+
+
+def get_weights(skincluster):
+    """Read the whole weight matrix of a skinCluster in one call
+
+    Return:
+        tuple:
+            np.ndarray of vertices x influences weights,
+            list of influence names in column order.
+    """
+    fn = get_skincluster_fn(skincluster)
+    dag_path = fn.getPathAtIndex(0)
+    weights, count = fn.getWeights(dag_path, _get_all_vertices(dag_path))
+    influences = [path.partialPathName() for path in fn.influenceObjects()]
+
+    return np.array(weights).reshape(-1, count), influences
+
+
+def load_weights_plugin():
+    name = os.path.splitext(os.path.basename(WEIGHTS_PLUGIN))[0]
+    if not cmds.pluginInfo(name, query=True, loaded=True):
+        cmds.loadPlugin(WEIGHTS_PLUGIN, quiet=True)
+
+
+def set_weights(skincluster, weights, vertices=None):
+    """Write skinCluster weights in one undoable API call
+
+    The rows go to the rtSetSkinWeights command through a temporary file,
+    it writes them with a single MFnSkinCluster.setWeights and keeps the
+    previous weights for the undo.
+
+    Args:
+        skincluster (str): skinCluster node
+        weights (np.ndarray): vertices x influences weights, columns in
+            get_weights order
+        vertices (array-like, optional): rows to write, all if not provided
+    """
+    load_weights_plugin()
+    if vertices is None:
+        vertices = np.arange(len(weights))
+    vertices = np.asarray(vertices, dtype=np.int64)
+
+    handle, file_path = tempfile.mkstemp(suffix=".npz")
+    os.close(handle)
+    try:
+        np.savez(file_path, vertices=vertices, weights=weights[vertices])
+        cmds.rtSetSkinWeights(skincluster, file_path)
+    finally:
+        os.remove(file_path)
+
+
+def mirror_skincluster_weights(
+    mesh,
+    axis="x",
+    positive_to_negative=True,
+    globs=utils.MIRROR_INFLUENCE_GLOBS,
+    tolerance=1e-3,
+):
+    """Mirror the skinCluster weights of a symmetrical mesh
+
+    Vertex rows are permuted with the cached symmetry map of the mesh and
+    influence columns with the glob rules, without ngSkinTools. Only the
+    destination vertices are written, the edit is undoable.
+
+    Args:
+        mesh (str): skinned mesh
+        axis (str): mirror axis in object space
+        positive_to_negative (bool): mirror direction
+        globs (list): influence mirror glob rules
+        tolerance (float): vertex matching tolerance of the symmetry map
+
+    Return:
+        str: the mirrored skinCluster
+    """
+    skincluster, types = utils.list_deformers(mesh, types=["skinCluster"])
+    if not skincluster:
+        cmds.error("No skinCluster found on {}".format(mesh), noContext=True)
+    skincluster = skincluster[0]
+
+    symmetry_map = symmetry.get_symmetry_map(
+        mesh, axis=axis, tolerance=tolerance
+    )
+    weights, influences = get_weights(skincluster)
+
+    mapping = utils.get_influences_mapping(influences, globs)
+    columns = {influence: i for i, influence in enumerate(influences)}
+    permutation = [columns[mapping[influence]] for influence in influences]
+
+    coordinates = geometry.get_points(mesh)[:, symmetry.AXIS_INDEX[axis]]
+    if not positive_to_negative:
+        coordinates = -coordinates
+    destination = (coordinates < -tolerance) & (symmetry_map.vertices >= 0)
+
+    source = weights[symmetry_map.vertices[destination]]
+    mirrored = weights.copy()
+    mirrored[destination] = source[:, permutation]
+    set_weights(skincluster, mirrored, np.flatnonzero(destination))
+
+    return skincluster
+
+
+def mirror_selection_skincluster_weights(positive_to_negative=True):
+    for mesh in utils.get_selection():
+        mirror_skincluster_weights(
+            mesh, positive_to_negative=positive_to_negative
+        )
+
+
+def transfer_skincluster_to_mirrored_mesh(
+    mesh,
+    target,
+    method="closestPoint",
+    keep_layers=False,
+    axis="x",
+    globs=utils.MIRROR_INFLUENCE_GLOBS,
+    tolerance=1e-3,
+):
+    """Skin a mirrored copy of a mesh with the mirrored weights
+
+    Target vertices are matched to the mesh vertices by index with
+    "vertexId" when the topologies match, else to the world reflection of
+    the mesh points with symmetry.get_mirrored_vertices. The target is
+    bound to the mirrored influences and its weights written in one call.
+    ngSkinTools layers, and meshes with unmatched vertices, go through the
+    legacy closest point transfer of a flipped mesh.
+
+    Args:
+        mesh (str): skinned mesh
+        target (str): mirrored copy of mesh
+        method (str): "vertexId" or "closestPoint"
+        keep_layers (bool): keep the ngSkinTools layers of target
+        axis (str): mirror axis in world space
+        globs (list): influence mirror glob rules
+        tolerance (float): vertex matching tolerance
+
+    Return:
+        str: the target skinCluster, None after a layers transfer
+    """
+    skincluster, types = utils.list_deformers(mesh, types=["skinCluster"])
+    if not skincluster:
+        cmds.error("No skinCluster found on {}".format(mesh), noContext=True)
+
+    vertices = None
+    if not keep_layers:
+        hashes = {geometry.get_topology_hash(x) for x in (mesh, target)}
+        if method == "vertexId" and len(hashes) == 1:
+            vertices = np.arange(cmds.polyEvaluate(target, vertex=True))
+        else:
+            vertices = symmetry.get_mirrored_vertices(
+                mesh, target, axis=axis, tolerance=tolerance
+            )
+    if vertices is None or np.any(vertices < 0):
+        _transfer_mirrored_layers(mesh, target, method, keep_layers)
+        return None
+
+    weights, influences = get_weights(skincluster[0])
+    mapping = utils.get_influences_mapping(
+        influences + cmds.ls(type="joint"), globs
+    )
+    mirrored = [mapping[influence] for influence in influences]
+
+    existing, types = utils.list_deformers(target, types=["skinCluster"])
+    if existing:
+        cmds.skinCluster(existing[0], edit=True, unbind=True)
+    name = "{}_skinCluster".format(target).rsplit("|")[-1]
+    target_skincluster = cmds.skinCluster(
+        list(dict.fromkeys(mirrored)),
+        target,
+        name=name,
+        **utils.SKINCLUSTER_SETTINGS,
+    )[0]
+
+    target_weights, target_influences = get_weights(target_skincluster)
+    columns = {influence: i for i, influence in enumerate(target_influences)}
+    result = np.zeros_like(target_weights)
+    np.add.at(
+        result,
+        (slice(None), [columns[x] for x in mirrored]),
+        weights[vertices],
+    )
+    set_weights(target_skincluster, result)
+
+    return target_skincluster
+
+
+def _transfer_mirrored_layers(mesh, target, method, keep_layers):
+    # ng config
+    infl_config = api.InfluenceMappingConfig.transfer_defaults()
+    infl_config.globs = [
+        ("L_*", "R_*"),
+        ("l_*", "r_*"),
+        ("lf_*", "rt_*"),
+        ("*_lf", "*_rt"),
+        ("M_*", "M_*"),
+    ]
+    infl_config.use_label_matching = False
+    infl_config.use_distance_matching = False
+    infl_config.use_name_matching = True
+
+    # mirror mesh
+    cmds.setAttr("{}.scaleX".format(mesh), lock=False)
+    cmds.setAttr("{}.scaleX".format(mesh), -1, lock=True)
+
+    # transfer skinCluster
+    skincluster, types = utils.list_deformers(target, types=["skinCluster"])
+    if skincluster and not keep_layers:
+        cmds.select(target)
+        cmds.DetachSkin()
+
+    cmds.select(mesh, target)
+    utils.copy_skincluster_callback(method="closestPoint")
+
+    t = api.transfer.LayersTransfer()
+    t.source = mesh
+    t.target = target
+    t.vertex_transfer_mode = method
+    t.influences_mapping.config = infl_config
+    t.keep_existing_layers = keep_layers
+
+    t.execute()
+
+    # restore mesh
+    cmds.setAttr("{}.scaleX".format(mesh), lock=False)
+    cmds.setAttr("{}.scaleX".format(mesh), 1, lock=True)
+
+
+def benchmark_mirror_skincluster_weights(vertex_count=100000, joint_pairs=10):
+    """Time mirror_skincluster_weights on a generated mesh
+
+    Builds a plane of about vertex_count vertices bound to L_/R_ joints,
+    times the symmetry map, the full weights read and write and the mirror,
+    then cleans up.
+
+    Return:
+        dict: durations in seconds
+    """
+    subdivisions = max(int(round(vertex_count**0.5)) - 1, 1)
+    mesh = cmds.polyPlane(
+        name="benchmark_mirror_mesh",
+        width=20,
+        height=20,
+        subdivisionsX=subdivisions,
+        subdivisionsY=subdivisions,
+        constructionHistory=False,
+    )[0]
+
+    joints = []
+    for i in range(joint_pairs):
+        for side, sign in (("L", 1), ("R", -1)):
+            cmds.select(clear=True)
+            joints.append(
+                cmds.joint(
+                    name="{}_benchmark_{:02d}_jnt".format(side, i),
+                    position=(sign * (i + 1) * 10.0 / joint_pairs, 0, 0),
+                )
+            )
+
+    skin_data = cmds.skinCluster(joints, mesh, **utils.SKINCLUSTER_SETTINGS)
+    skincluster = skin_data[0]
+
+    timings = {}
+    start = time.perf_counter()
+    symmetry.get_symmetry_map(mesh, rebuild=True)
+    timings["symmetry map"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    weights, _ = get_weights(skincluster)
+    timings["read weights"] = time.perf_counter() - start
+
+    load_weights_plugin()
+    start = time.perf_counter()
+    set_weights(skincluster, weights)
+    timings["write weights"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mirror_skincluster_weights(mesh)
+    timings["mirror"] = time.perf_counter() - start
+
+    print(
+        "Mirror skin weights on {} vertices, {} influences".format(
+            cmds.polyEvaluate(mesh, vertex=True), len(joints)
+        )
+    )
+    for label, duration in timings.items():
+        print("  {}: {:.3f}s".format(label, duration))
+
+    cmds.delete(mesh, joints)
+
+    return timings
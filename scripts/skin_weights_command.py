@@ -0,0 +1,99 @@
+"""Undoable skinCluster weights write, loaded as a plugin by skin.py
+
+rtSetSkinWeights skinCluster file
+
+The file is a .npz holding "vertices" indices and their "weights" rows,
+vertices x influences in influenceObjects order. The rows are written with
+a single MFnSkinCluster.setWeights call, the previous weights are kept for
+the undo.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
+import numpy as np
+
+COMMAND_NAME = "rtSetSkinWeights"
+
+
+def maya_useNewAPI():
+    pass
+
+
+class SetSkinWeightsCommand(om.MPxCommand):
+    def __init__(self):
+        super(SetSkinWeightsCommand, self).__init__()
+        self.fn = None
+        self.dag_path = None
+        self.component = None
+        self.influences = None
+        self.weights = None
+        self.old_weights = None
+
+    @staticmethod
+    def creator():
+        return SetSkinWeightsCommand()
+
+    @staticmethod
+    def create_syntax():
+        syntax = om.MSyntax()
+        syntax.addArg(om.MSyntax.kString)
+        syntax.addArg(om.MSyntax.kString)
+        return syntax
+
+    def isUndoable(self):
+        return True
+
+    def doIt(self, args):
+        parser = om.MArgDatabase(self.syntax(), args)
+        skincluster = parser.commandArgumentString(0)
+        data = np.load(parser.commandArgumentString(1))
+        vertices = data["vertices"]
+        weights = data["weights"]
+
+        selection = om.MSelectionList()
+        selection.add(skincluster)
+        self.fn = oma.MFnSkinCluster(selection.getDependNode(0))
+        self.dag_path = self.fn.getPathAtIndex(0)
+
+        fn_component = om.MFnSingleIndexedComponent()
+        self.component = fn_component.create(om.MFn.kMeshVertComponent)
+        fn_component.addElements(vertices.tolist())
+
+        self.influences = om.MIntArray(range(weights.shape[1]))
+        self.weights = om.MDoubleArray(weights.ravel().tolist())
+        self.redoIt()
+
+    def redoIt(self):
+        self.old_weights = self.fn.setWeights(
+            self.dag_path,
+            self.component,
+            self.influences,
+            self.weights,
+            False,
+            True,
+        )
+
+    def undoIt(self):
+        self.fn.setWeights(
+            self.dag_path,
+            self.component,
+            self.influences,
+            self.old_weights,
+            False,
+        )
+
+
+def initializePlugin(plugin):
+    om.MFnPlugin(plugin).registerCommand(
+        COMMAND_NAME,
+        SetSkinWeightsCommand.creator,
+        SetSkinWeightsCommand.create_syntax,
+    )
+
+
+def uninitializePlugin(plugin):
+    om.MFnPlugin(plugin).deregisterCommand(COMMAND_NAME)
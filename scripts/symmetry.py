@@ -0,0 +1,350 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+import numpy as np
+from maya import cmds
+
+from . import components
+from . import geometry
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+AXIS_INDEX = {"x": 0, "y": 1, "z": 2}
+COMPONENT_TABLES = {"vtx": "vertices", "e": "edges", "f": "faces"}
+CACHE_DIR = os.path.join(
+    cmds.internalVar(userAppDir=True), "rigging_tools", "symmetry"
+)
+
+_SYMMETRY_MAPS = {}
+
+
+class SymmetryMap(object):
+    """Vertex, edge and face mirror tables of a mesh topology
+
+    Every table stores the mirrored index for each component, -1 when no
+    mirror was found.
+    """
+
+    def __init__(self, topology_hash, vertices, edges, faces):
+        self.topology_hash = topology_hash
+        self.vertices = vertices
+        self.edges = edges
+        self.faces = faces
+
+    @classmethod
+    def load(cls, file_path):
+        data = np.load(file_path)
+        return cls(
+            str(data["topology_hash"]),
+            data["vertices"],
+            data["edges"],
+            data["faces"],
+        )
+
+    def save(self, file_path):
+        directory = os.path.dirname(file_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        np.savez(
+            file_path,
+            topology_hash=self.topology_hash,
+            vertices=self.vertices,
+            edges=self.edges,
+            faces=self.faces,
+        )
+
+    def mirror_vertices(self, indices):
+        return self.vertices[np.asarray(indices, dtype=np.int64)]
+
+    def mirror_edges(self, indices):
+        return self.edges[np.asarray(indices, dtype=np.int64)]
+
+    def mirror_faces(self, indices):
+        return self.faces[np.asarray(indices, dtype=np.int64)]
+
+
+def _match_points(points, targets, tolerance):
+    """Index of the closest point for each target, -1 above tolerance"""
+    if cKDTree is not None:
+        distances, indices = cKDTree(points).query(
+            targets, distance_upper_bound=tolerance
+        )
+        indices[np.isinf(distances)] = -1
+        return indices.astype(np.int64)
+
+    # Spatial hashing fallback: scan every point of the 27 cells around
+    # each target, a cell is the run of its key in the sorted keys
+    cells = np.floor(points / tolerance).astype(np.int64)
+    origin = cells.min(axis=0) - 1
+    size = cells.max(axis=0) - origin + 2
+
+    def encode(keys):
+        keys = keys - origin
+        valid = np.all((keys >= 0) & (keys < size), axis=1)
+        encoded = (keys[:, 0] * size[1] + keys[:, 1]) * size[2] + keys[:, 2]
+        return encoded, valid
+
+    point_keys, _ = encode(cells)
+    order = np.argsort(point_keys)
+    sorted_keys = point_keys[order]
+
+    target_cells = np.floor(targets / tolerance).astype(np.int64)
+    result = np.full(len(targets), -1, dtype=np.int64)
+    best = np.full(len(targets), tolerance)
+    for offset in np.ndindex(3, 3, 3):
+        keys, valid = encode(target_cells + np.array(offset) - 1)
+        left = np.searchsorted(sorted_keys, keys, side="left")
+        right = np.searchsorted(sorted_keys, keys, side="right")
+        counts = np.where(valid, right - left, 0)
+        if not counts.any():
+            continue
+
+        # One pair per target and point of its cell
+        target_ids = np.repeat(np.arange(len(targets)), counts)
+        starts = np.repeat(left - np.cumsum(counts) + counts, counts)
+        candidates = order[starts + np.arange(len(target_ids))]
+        distances = np.linalg.norm(
+            points[candidates] - targets[target_ids], axis=1
+        )
+
+        # Closest pair of each target
+        pairs = np.lexsort((distances, target_ids))
+        first = np.concatenate((
+            [True],
+            target_ids[pairs][1:] != target_ids[pairs][:-1],
+        ))
+        pairs = pairs[first]
+        ids = target_ids[pairs]
+        closer = distances[pairs] <= best[ids]
+        result[ids[closer]] = candidates[pairs][closer]
+        best[ids[closer]] = distances[pairs][closer]
+
+    return result
+
+
+def _topological_fallback(vertices, points, reflected, edges):
+    """Resolve unmatched vertices by walking from their matched neighbours"""
+    neighbours = [[] for _ in range(len(points))]
+    for a, b in edges.tolist():
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+
+    used = set(vertices[vertices >= 0].tolist())
+    unmatched = set(np.flatnonzero(vertices < 0).tolist())
+    while unmatched:
+        resolved = 0
+        for vertex in list(unmatched):
+            candidates = set()
+            for neighbour in neighbours[vertex]:
+                mirror = vertices[neighbour]
+                if mirror >= 0:
+                    candidates.update(neighbours[mirror])
+            candidates -= used
+            if not candidates:
+                continue
+
+            candidates = list(candidates)
+            distances = np.linalg.norm(
+                points[candidates] - reflected[vertex], axis=1
+            )
+            match = candidates[int(np.argmin(distances))]
+            vertices[vertex] = match
+            used.add(match)
+            unmatched.discard(vertex)
+            resolved += 1
+
+        if not resolved:
+            break
+
+    return vertices
+
+
+def _mirror_edges(vertices, edges):
+    count = len(vertices)
+    keys = np.sort(edges, axis=1)
+    keys = keys[:, 0] * count + keys[:, 1]
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+
+    mirrored = vertices[edges]
+    valid = np.all(mirrored >= 0, axis=1)
+    mirrored = np.sort(mirrored, axis=1)
+    mirrored_keys = mirrored[:, 0] * count + mirrored[:, 1]
+
+    found = np.minimum(
+        np.searchsorted(sorted_keys, mirrored_keys), len(keys) - 1
+    )
+    valid &= sorted_keys[found] == mirrored_keys
+
+    return np.where(valid, order[found], -1)
+
+
+def _mirror_faces(vertices, counts, connects):
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    faces = [
+        tuple(sorted(connects[start:end].tolist()))
+        for start, end in zip(offsets[:-1], offsets[1:])
+    ]
+    lookup = {face: i for i, face in enumerate(faces)}
+
+    mirrored = vertices[connects].tolist()
+    result = np.full(len(faces), -1, dtype=np.int64)
+    for i, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+        face = tuple(sorted(mirrored[start:end]))
+        result[i] = lookup.get(face, -1)
+
+    return result
+
+
+def build_symmetry_map(mesh, axis="x", tolerance=1e-3, topology_hash=None):
+    """Compute the mirror tables of a mesh
+
+    Vertices are matched with a KD-tree on the reflected positions, the
+    ones out of tolerance are resolved through their neighbours.
+
+    Args:
+        mesh (str): symmetrical mesh
+        axis (str): mirror axis in object space
+        tolerance (float): maximum distance between a vertex and the
+            reflection of its mirror
+        topology_hash (str, optional): topology hash of mesh, computed if
+            not provided
+
+    Return:
+        SymmetryMap
+    """
+    points = geometry.get_points(mesh)
+    counts, connects = geometry.get_topology(mesh)
+    edges = geometry.get_edges(mesh)
+
+    reflected = points.copy()
+    reflected[:, AXIS_INDEX[axis]] *= -1
+
+    vertices = _match_points(points, reflected, tolerance)
+    vertices = _topological_fallback(vertices, points, reflected, edges)
+
+    missing = int(np.count_nonzero(vertices < 0))
+    if missing:
+        cmds.warning(
+            "{} vertices without mirror on {}".format(missing, mesh),
+            noContext=True,
+        )
+
+    return SymmetryMap(
+        topology_hash or geometry.get_topology_hash(mesh),
+        vertices,
+        _mirror_edges(vertices, edges),
+        _mirror_faces(vertices, counts, connects),
+    )
+
+
+def get_symmetry_map(
+    mesh,
+    axis="x",
+    tolerance=1e-3,
+    cache_dir=CACHE_DIR,
+    rebuild=False,
+    topology_hash=None,
+):
+    """Get the symmetry map of a mesh, computed once per topology
+
+    Maps are kept in memory and saved in cache_dir keyed by topology hash,
+    axis and tolerance. The first build must see the mesh in its neutral
+    symmetrical pose, point positions are not part of the key: use rebuild
+    after remodelling the mesh without changing its topology.
+
+    Args:
+        topology_hash (str, optional): topology hash of mesh, callers
+            already holding it save its computation
+
+    Return:
+        SymmetryMap
+    """
+    topology_hash = topology_hash or geometry.get_topology_hash(mesh)
+    key = "{}_{}_{:g}".format(topology_hash, axis, tolerance)
+    file_path = os.path.join(cache_dir, key + ".npz") if cache_dir else None
+
+    if not rebuild:
+        if key in _SYMMETRY_MAPS:
+            return _SYMMETRY_MAPS[key]
+        if file_path and os.path.isfile(file_path):
+            _SYMMETRY_MAPS[key] = SymmetryMap.load(file_path)
+            return _SYMMETRY_MAPS[key]
+
+    symmetry_map = build_symmetry_map(
+        mesh, axis=axis, tolerance=tolerance, topology_hash=topology_hash
+    )
+    if file_path:
+        symmetry_map.save(file_path)
+    _SYMMETRY_MAPS[key] = symmetry_map
+
+    return symmetry_map
+
+
+def get_mirrored_vertices(mesh, target, axis="x", tolerance=1e-3):
+    """Match the vertices of a mirrored copy to the vertices of a mesh
+
+    Each target vertex gets the mesh vertex found at its world reflection,
+    with the KD-tree of the symmetry maps.
+
+    Args:
+        mesh (str): source mesh
+        target (str): mesh modelled as the world reflection of mesh
+        axis (str): mirror axis in world space
+        tolerance (float): maximum distance between a target vertex and the
+            reflection of its mesh vertex
+
+    Return:
+        np.ndarray: mesh vertex index per target vertex, -1 without mirror
+    """
+    reflected = geometry.get_points(mesh, world_space=True)
+    reflected[:, AXIS_INDEX[axis]] *= -1
+    targets = geometry.get_points(target, world_space=True)
+
+    return _match_points(reflected, targets, tolerance)
+
+
+def mirror_component_set(
+    component_set, axis="x", tolerance=1e-3, topology_hash=None
+):
+    """Mirror vertices, edges or faces with the cached symmetry map
+
+    Neither the selection nor the modelling preferences are used.
+
+    Args:
+        component_set (components.ComponentSet): "vtx", "e" or "f" set
+        axis (str): mirror axis in object space
+        tolerance (float): vertex matching tolerance of the symmetry map
+        topology_hash (str, optional): topology hash of the mesh
+
+    Return:
+        components.ComponentSet: mirrored components, the ones without
+            mirror are dropped
+    """
+    symmetry_map = get_symmetry_map(
+        component_set.node,
+        axis=axis,
+        tolerance=tolerance,
+        topology_hash=topology_hash,
+    )
+    table = getattr(symmetry_map, COMPONENT_TABLES[component_set.kind])
+    mirrored = table[component_set.indices]
+
+    return components.ComponentSet(
+        component_set.node, component_set.kind, mirrored[mirrored >= 0]
+    )
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    _SYMMETRY_MAPS.clear()
+    if not cache_dir or not os.path.isdir(cache_dir):
+        return
+    for each in os.listdir(cache_dir):
+        if each.endswith(".npz"):
+            os.remove(os.path.join(cache_dir, each))
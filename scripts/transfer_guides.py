@@ -4,6 +4,10 @@ from __future__ import print_function
 
 import maya.api.OpenMaya as om
 import maya.cmds as cmds
+import numpy as np
+
+from . import components
+from . import geometry
 
 
 def smart_parent_constraint(driver, driven, rotates=True, tolerance=1e-4):
@@ -42,6 +46,18 @@ def smart_parent_constraint(driver, driven, rotates=True, tolerance=1e-4):
 
 def get_closest_points(point, target_points, count=1):
     pos = cmds.xform(point, query=True, translation=True, worldSpace=True)
+    if isinstance(target_points, components.ComponentSet):
+        positions = geometry.get_points(
+            target_points.node, target_points.indices, world_space=True
+        )
+        distances = np.linalg.norm(positions - pos, axis=1)
+        order = np.argsort(distances, kind="stable")[:count]
+        return components.ComponentSet(
+            target_points.node,
+            target_points.kind,
+            target_points.indices[order],
+        )
+
     distances = []
     for tgt_point in target_points:
         position = cmds.pointPosition(tgt_point, world=True)
@@ -54,10 +70,11 @@ def get_closest_points(point, target_points, count=1):
 
 def get_multiple_closest_uvs(mesh, obj, count=3):
     closest_points = get_closest_points(
-        obj, cmds.ls(mesh + ".vtx[*]", flatten=True), count=count
+        obj, components.ComponentSet.all(mesh, "vtx")[0], count=count
     )
     closest_uvs = []
-    for point in closest_points:
+    for index in closest_points.indices.tolist():
+        point = "{}.vtx[{}]".format(closest_points.node, index)
         uvs = cmds.polyListComponentConversion(point, toUV=True)
         uv_positions = cmds.polyEditUV(uvs, query=True)[0:2]
         closest_uvs.append(uv_positions)
@@ -2,6 +2,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
+
 try:
     from qtpy import QtCore
     from qtpy import QtWidgets
@@ -59,6 +61,12 @@ import rig.control
 from maya import cmds
 from rig.utils import constraint_util
 
+from . import components
+from . import curve_sampling
+from . import geometry
+from . import symmetry
+from . import utils
+
 SIDES = "LR"
 MOVE_LOC = "M_move_locator"
 RIG_GRP = "rig_grp"
@@ -67,8 +75,42 @@ PARENT_JOINT = "M_base_02_jnt"
 TARGET_MESH = "M_head_rig02_mesh"
 
 
-def build_tweakers(label="eyelid_upper", jnt_number=3, do_sym=True):
-    sel = get_selection_flatten()
+def get_default_config():
+    """Scene names used by the build, passed explicitly to build_tweakers"""
+    return {
+        "sides": SIDES,
+        "move_loc": MOVE_LOC,
+        "rig_grp": RIG_GRP,
+        "secondary_grp": SECONDARY_GRP,
+        "parent_joint": PARENT_JOINT,
+        "target_mesh": TARGET_MESH,
+    }
+
+
+def build_tweakers(
+    label="eyelid_upper",
+    jnt_number=3,
+    do_sym=True,
+    arc_length=True,
+    edges=None,
+    config=None,
+):
+    """Build tweaker controllers following edge loops
+
+    Args:
+        label (str): setup name, prefixed by the side
+        jnt_number (int): joints per side
+        do_sym (bool): build the mirrored side too
+        arc_length (bool): space the joints evenly by curve length
+        edges (list, optional): edges of the setup, the selection if not
+            provided
+        config (dict, optional): scene names, see get_default_config
+    """
+    config = dict(get_default_config(), **(config or {}))
+    target_mesh = config["target_mesh"]
+    move_loc = config["move_loc"]
+
+    sel = edges or get_selection_flatten()
     if not sel:
         cmds.error(
             "Please select edges where to build the setup", noContext=True
@@ -76,34 +118,37 @@ def build_tweakers(label="eyelid_upper", jnt_number=3, do_sym=True):
 
     sym_sel = []
     if do_sym:
-        cmds.symmetricModelling(symmetry=True, axis="x", about="object")
-        cmds.select(sel, symmetry=True)
-        sym = get_selection_flatten()
-        cmds.symmetricModelling(symmetry=False)
-        sym_sel = [edge for edge in sym if edge not in sel]
+        sym_sel = components.to_strings(get_symmetric_edges(sel))
 
+    skin_cluster = None
+    if cmds.objExists(target_mesh):
+        history = cmds.listHistory(target_mesh, pruneDagObjects=True)
+        skin_clusters = cmds.ls(history, type="skinCluster")
+        skin_cluster = skin_clusters[0] if skin_clusters else None
+
+    joints = []
     for i, edges in enumerate([sel, sym_sel]):
         if not edges:
             continue
 
         # groups
-        side_label = SIDES[i] + "_" + label
+        side_label = config["sides"][i] + "_" + label
         base_grp = cmds.createNode(
             "transform",
             name=side_label + "_rig_grp",
-            parent=RIG_GRP,
+            parent=config["rig_grp"],
             skipSelect=True,
         )
         jnt_grp = cmds.createNode(
             "transform",
             name=side_label + "_jnt_grp",
-            parent=PARENT_JOINT,
+            parent=config["parent_joint"],
             skipSelect=True,
         )
         ctrl_grp = cmds.createNode(
             "transform",
             name=side_label + "_ctrl_grp",
-            parent=SECONDARY_GRP,
+            parent=config["secondary_grp"],
             skipSelect=True,
         )
         misc_grp = cmds.createNode(
@@ -118,8 +163,15 @@ def build_tweakers(label="eyelid_upper", jnt_number=3, do_sym=True):
         curve, history = cmds.polyToCurve(name=side_label + "_curve")
         cmds.setAttr(history + ".conformToSmoothMeshPreview", 0, lock=True)
         cmds.parent(curve, misc_grp)
-        lenght = cmds.getAttr(curve + "Shape.maxValue")
-        distance = lenght / (jnt_number - 1)
+        if arc_length:
+            parameters = curve_sampling.get_uniform_parameters(
+                curve, jnt_number
+            )
+        else:
+            lenght = cmds.getAttr(curve + "Shape.maxValue")
+            distance = lenght / max(jnt_number - 1, 1)
+            parameters = [distance * x for x in range(jnt_number)]
+        ctrls = []
         for i in range(jnt_number):
             name = "{}_{}".format(side_label, i)
             jnt_zero = cmds.createNode(
@@ -139,24 +191,19 @@ def build_tweakers(label="eyelid_upper", jnt_number=3, do_sym=True):
             for attr in attrs:
                 cmds.connectAttr(ctrl + attr, jnt + attr)
 
-            pos = distance * i
-            hook = create_hook_on_curve(
-                curve,
-                pos,
-                ctrl_zero,
-                attrs=["translate"],
-                curve_attrs=["position"],
-                inherits_transform=True,
-            )
-            matrix_match_transforms(jnt_zero, ctrl_zero)
+            ctrls.append((name, ctrl, ctrl_zero, jnt_zero))
+            joints.append(jnt)
 
-            # add jnt to skin
-            if cmds.objExists(TARGET_MESH):
-                history = cmds.listHistory(TARGET_MESH, pruneDagObjects=True)
-                skin_cluster = cmds.ls(history, type="skinCluster")[0]
-                cmds.skinCluster(
-                    skin_cluster, edit=True, addInfluence=jnt, weight=0
-                )
+        hooks = utils.create_hooks_on_curve(
+            curve,
+            parameters,
+            [x[2] for x in ctrls],
+            attrs=["translate"],
+            curve_attrs=["position"],
+            inherits_transform=True,
+        )
+        for (name, ctrl, ctrl_zero, jnt_zero), hook in zip(ctrls, hooks):
+            matrix_match_transforms(jnt_zero, ctrl_zero)
 
             # cancel double translates
             md = cmds.createNode(
@@ -170,12 +217,107 @@ def build_tweakers(label="eyelid_upper", jnt_number=3, do_sym=True):
             # connect to global transforms
             for attr in "rs":
                 plug = "." + attr
-                cmds.connectAttr(MOVE_LOC + plug, hook + plug)
+                cmds.connectAttr(move_loc + plug, hook + plug)
         constraint_util.mtx_parent_constraint(
-            MOVE_LOC, curve, maintain_offset=True
+            move_loc, curve, maintain_offset=True
+        )
+
+    # add joints to skin
+    if skin_cluster:
+        start = time.perf_counter()
+        utils.add_skincluster_influences(skin_cluster, joints)
+        print(
+            "Added {} joints to {} in {:.3f}s".format(
+                len(joints), skin_cluster, time.perf_counter() - start
+            )
         )
 
 
+def get_changed_topologies(topology):
+    """Meshes whose topology hash differs from the recorded one
+
+    Args:
+        topology (dict): {mesh: topology hash}
+
+    Return:
+        list: changed or missing meshes
+    """
+    return [
+        mesh
+        for mesh, topology_hash in topology.items()
+        if not cmds.objExists(mesh)
+        or geometry.get_cached_topology_hash(mesh) != topology_hash
+    ]
+
+
+def build_tweakers_queue(jobs, config=None):
+    """Build several tweaker setups in one undo chunk, refresh suspended
+
+    Args:
+        jobs (list): dict per setup with "label", "edges", "jnt_number"
+            and "do_sym" keys, see build_tweakers, and an optional
+            "topology" key {mesh: topology hash} checked before the build
+        config (dict, optional): scene names, see get_default_config
+
+    Return:
+        list: (label, duration in seconds) per job
+    """
+    timings = []
+    cmds.undoInfo(openChunk=True, chunkName="build_tweakers_queue")
+    cmds.refresh(suspend=True)
+    try:
+        for job in jobs:
+            job = dict(job)
+            changed = get_changed_topologies(job.pop("topology", {}))
+            if changed:
+                cmds.error(
+                    "Topology of {} changed since {} was queued".format(
+                        ", ".join(changed), job["label"]
+                    ),
+                    noContext=True,
+                )
+
+            start = time.perf_counter()
+            build_tweakers(config=config, **job)
+            timings.append((job["label"], time.perf_counter() - start))
+    finally:
+        cmds.refresh(suspend=False)
+        cmds.undoInfo(closeChunk=True)
+
+    print("Tweakers queue:")
+    for label, duration in timings:
+        print("  {}: {:.3f}s".format(label, duration))
+    print("  total: {:.3f}s".format(sum(x[1] for x in timings)))
+
+    return timings
+
+
+def get_symmetric_edges(edges, topology=None):
+    """Mirror edges through the cached symmetry map of their mesh
+
+    Args:
+        edges (list): edge strings
+        topology (dict, optional): {mesh: topology hash} already known
+
+    Return:
+        list: ComponentSet per mesh, the edges on the symmetry line which
+            mirror on themselves are removed
+    """
+    sym_edges = []
+    for component_set in components.ComponentSet.from_strings(edges):
+        mirrored = symmetry.mirror_component_set(
+            component_set,
+            topology_hash=(topology or {}).get(component_set.node),
+        )
+        original = set(component_set.indices.tolist())
+        indices = [x for x in mirrored.indices.tolist() if x not in original]
+        sym_edges.append(
+            components.ComponentSet(component_set.node, "e", indices)
+        )
+
+    return sym_edges
+
+
 def get_selection_flatten():
     return cmds.ls(selection=True, flatten=True)
 
@@ -212,93 +354,22 @@ def create_hook_on_curve(
     remove_child_suffix=True,
     child_axis_order="X-YZ",
     relative=True,
+    arc_length=False,
 ):
-    name = curve + "_crv"
-    if child:
-        name = "{}_crv".format(child)
-        if remove_child_suffix:
-            name = "{}_crv".format("_".join(child.split("_")[:-1]))
-
-    hook = cmds.createNode(
-        "transform", name="{}_hook_grp".format(name), skipSelect=True
-    )
-    posi = cmds.createNode(
-        "pointOnCurveInfo", name="{}_posi".format(name), skipSelect=True
-    )
-    fbfmx = cmds.createNode(
-        "fourByFourMatrix", name="{}_fbmx".format(name), skipSelect=True
-    )
-    mmx = cmds.createNode(
-        "multMatrix", name="{}_mx".format(name), skipSelect=True
-    )
-    dmx = cmds.createNode(
-        "decomposeMatrix", name="{}_dmx".format(name), skipSelect=True
-    )
-
-    if not inherits_transform:
-        cmds.setAttr("{}.inheritsTransform".format(hook), 0, lock=True)
-    cmds.setAttr("{}.parameter".format(posi), position, lock=True)
-
-    # connect hook
-    cmds.connectAttr(curve + ".worldSpace[0]", posi + ".inputCurve")
-
-    match_indices = {
-        "position": 3,
-        "normalizedNormal": 0,
-        "normalizedTangent": 1,
-    }
-    for surf_attr in curve_attrs:
-        indice = match_indices[surf_attr]
-        for i, axis in enumerate("XYZ"):
-            cmds.connectAttr(
-                "{}.{}{}".format(posi, surf_attr, axis),
-                "{}.in{}{}".format(fbfmx, indice, i),
-            )
-
-    cmds.connectAttr(fbfmx + ".output", mmx + ".matrixIn[0]")
-    cmds.connectAttr(hook + ".parentInverseMatrix[0]", mmx + ".matrixIn[1]")
-    cmds.connectAttr(mmx + ".matrixSum", dmx + ".inputMatrix")
-
-    if child:
-        matrix_match_transforms(hook, child)
-
-    for attr in attrs:
-        cmds.connectAttr(
-            "{}.output{}".format(dmx, attr[0].upper() + attr[1:]),
-            "{}.{}".format(hook, attr),
-        )
-
-    if child:
-        try:
-            childParent = cmds.listRelatives(child, parent=True, path=True)
-        except RuntimeError:
-            childParent = None
-
-        cmds.parent(child, hook, relative=relative)
-        if childParent:
-            cmds.parent(hook, childParent)
-
-        if reset:
-            reset_attrs = attrs
-            if cmds.objectType(child) == "joint":
-                reset_attrs = list(attrs) + ["jointOrient"]
-            reset_transforms(child, reset_attrs)
-
-            axis_to_rotation = {
-                "X-YZ": (0, 0, 0),
-                "XZY": (90, 0, 0),
-                "X-Z-Y": (-90, 0, 0),
-                "Z-Y-X": (0, 90, 0),
-                "-Z-YX": (0, -90, 0),
-                "-Y-XZ": (0, 0, 90),
-                "YXZ": (0, 0, -90),
-                "Y-X-Z": (180, 0, 90),
-                "XY-Z": (180, 0, 0),
-            }
-            rot = axis_to_rotation[child_axis_order]
-            cmds.xform(child, rotation=rot, objectSpace=True)
-
-    return hook
+    """Create a transform following a curve, see utils.create_hooks_on_curve"""
+    return utils.create_hooks_on_curve(
+        curve,
+        [position],
+        [child],
+        reset=reset,
+        attrs=attrs,
+        curve_attrs=curve_attrs,
+        inherits_transform=inherits_transform,
+        remove_child_suffix=remove_child_suffix,
+        child_axis_order=child_axis_order,
+        relative=relative,
+        arc_length=arc_length,
+    )[0]
 
 
 def maya_main_window():
@@ -513,6 +584,7 @@ class TweakerUI(QtWidgets.QWidget):
 
         # Set window properties
         self.setWindowTitle("Tweaker Builder")
+        self.setObjectName("TweakerBuilderUI")
         self.setFixedSize(400, 900)
         self.setWindowFlags(QtCore.Qt.Window | QtCore.Qt.WindowStaysOnTopHint)
         self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
@@ -540,9 +612,20 @@ class TweakerUI(QtWidgets.QWidget):
             }
         """)
 
+        self.queue = []
+        self.validated_selection = []
+        self.validated_topology = {}
+        self._building = False
+
         self._build_ui()
         self._connect_signals()
 
+        # Live validation, killed with the window
+        self._selection_job = cmds.scriptJob(
+            event=["SelectionChanged", self._on_selection_changed],
+            parent=self.objectName(),
+        )
+
         # Auto-validate selection on startup
         QtCore.QTimer.singleShot(100, self.validate_selection)
 
@@ -564,6 +647,9 @@ class TweakerUI(QtWidgets.QWidget):
         # Global variables section
         self._create_globals_section(main_layout)
 
+        # Build queue section
+        self._create_queue_section(main_layout)
+
         # Action buttons
         self._create_buttons(main_layout)
 
@@ -755,6 +841,35 @@ class TweakerUI(QtWidgets.QWidget):
         globals_layout.addLayout(globals_form)
         layout.addWidget(globals_frame)
 
+    def _create_queue_section(self, layout):
+        """Create build queue section"""
+        queue_layout = QtWidgets.QHBoxLayout()
+        queue_layout.setSpacing(10)
+
+        self.queue_label = QtWidgets.QLabel("Queue: empty")
+
+        self.queue_add_btn = ModernButton("Add to Queue")
+        self.queue_add_btn.setToolTip(
+            "Stash the validated edges with the current label and joint count"
+        )
+
+        self.queue_clear_btn = ModernButton("Clear")
+        self.queue_clear_btn.setToolTip("Remove all the queued setups")
+
+        self.queue_build_btn = ModernButton("Build Queue")
+        self.queue_build_btn.setEnabled(False)
+        self.queue_build_btn.setToolTip(
+            "Build all the queued setups in a single undo step"
+        )
+
+        queue_layout.addWidget(self.queue_label)
+        queue_layout.addStretch()
+        queue_layout.addWidget(self.queue_add_btn)
+        queue_layout.addWidget(self.queue_clear_btn)
+        queue_layout.addWidget(self.queue_build_btn)
+
+        layout.addLayout(queue_layout)
+
     def _create_buttons(self, layout):
         """Create action buttons"""
         button_layout = QtWidgets.QHBoxLayout()
@@ -782,10 +897,21 @@ class TweakerUI(QtWidgets.QWidget):
         self.validate_btn.clicked.connect(self.validate_selection)
         self.build_btn.clicked.connect(self.run_tweakers)
         self.close_btn.clicked.connect(self.close)
+        self.queue_add_btn.clicked.connect(self.add_to_queue)
+        self.queue_clear_btn.clicked.connect(self.clear_queue)
+        self.queue_build_btn.clicked.connect(self.run_queue)
 
         # Auto-validate when parameters change
         self.label_input.textChanged.connect(self._update_build_button)
         self.joint_spinbox.valueChanged.connect(self._update_build_button)
+        self.symmetry_checkbox.stateChanged.connect(self.validate_selection)
+
+    def closeEvent(self, event):
+        """Kill the selection scriptJob and the topology callbacks"""
+        if cmds.scriptJob(exists=self._selection_job):
+            cmds.scriptJob(kill=self._selection_job, force=True)
+        geometry.clear_topology_hashes()
+        super(TweakerUI, self).closeEvent(event)
 
     def keyPressEvent(self, event):
         """Override keyPressEvent to prevent Maya from taking focus."""
@@ -796,43 +922,92 @@ class TweakerUI(QtWidgets.QWidget):
             super(TweakerUI, self).keyPressEvent(event)
 
     def validate_selection(self):
-        """Validate current Maya selection"""
+        """Validate current Maya selection
+
+        Edges are stored as index ranges per mesh with the topology hash of
+        the mesh, the selection is never flattened.
+        """
         try:
             # Get current selection
-            selection = cmds.ls(selection=True, flatten=True)
+            selection = cmds.ls(selection=True)
 
             if not selection:
                 self._update_selection_status("No selection found", False)
-                self.validated_selection = []
+                self._clear_validated_selection()
                 return False
 
             # Check if selection contains edges
-            edges = cmds.filterExpand(
-                selection, selectionMask=32
-            )  # 32 = edges
+            edge_sets = components.ComponentSet.from_strings(selection)
+            edge_sets = [x for x in edge_sets if x.kind == "e"]
 
-            if not edges:
+            if not edge_sets:
                 self._update_selection_status(
                     "Selection contains no edges", False
                 )
-                self.validated_selection = []
+                self._clear_validated_selection()
                 return False
 
             # Store validated selection for later use
-            self.validated_selection = edges
+            self.validated_selection = edge_sets
+            self.validated_topology = {
+                x.node: geometry.get_cached_topology_hash(x.node)
+                for x in edge_sets
+            }
 
             # Valid selection found
-            edge_count = len(edges)
-            self._update_selection_status(
-                "Valid: {} edges selected".format(edge_count), True
-            )
+            edge_count = sum(len(x) for x in edge_sets)
+            message = "Valid: {} edges selected".format(edge_count)
+            if self.symmetry_checkbox.isChecked():
+                sym_edges = get_symmetric_edges(
+                    self.get_validated_edges(), self.validated_topology
+                )
+                message += ", {} mirrored".format(
+                    sum(len(x) for x in sym_edges)
+                )
+            self._update_selection_status(message, True)
             return True
 
         except Exception as e:
             self._update_selection_status("Error: {}".format(str(e)), False)
-            self.validated_selection = []
+            self._clear_validated_selection()
             return False
 
+    def _clear_validated_selection(self):
+        self.validated_selection = []
+        self.validated_topology = {}
+
+    def get_validated_edges(self):
+        """Compressed edge strings of the validated selection"""
+        return components.to_strings(self.validated_selection)
+
+    def restore_selection(self):
+        """Select the validated edges back from their ranges"""
+        cmds.select(self.get_validated_edges())
+
+    def check_topology(self, topology=None):
+        """Warn if a validated mesh topology changed since the validation
+
+        Args:
+            topology (dict, optional): {mesh: topology hash}, the validated
+                selection ones if not provided
+
+        Return:
+            bool: True if the stored edge indices are still valid
+        """
+        if topology is None:
+            topology = self.validated_topology
+        changed = get_changed_topologies(topology)
+        for mesh in changed:
+            message = "Topology of {} changed since the validation"
+            cmds.warning(message.format(mesh), noContext=True)
+
+        return not changed
+
+    def _on_selection_changed(self):
+        # The builds select edges, skip their selection changes
+        if not self._building:
+            self.validate_selection()
+
     def _update_selection_status(self, message, is_valid):
         """Update selection status display"""
         self.selection_label.setText("Selection: {}".format(message))
@@ -867,33 +1042,30 @@ class TweakerUI(QtWidgets.QWidget):
         """Execute the tweaker building process"""
         try:
             # Restore the validated selection before building
-            if self.validated_selection:
-                cmds.select(self.validated_selection)
+            if not self.check_topology():
+                self._show_error_message(
+                    "Mesh topology changed, validate the selection again"
+                )
+                return
+            self.restore_selection()
 
             # Get parameters
             label = self.label_input.text().strip()
             joint_count = self.joint_spinbox.value()
             do_symmetry = self.symmetry_checkbox.isChecked()
 
-            global \
-                SIDES, \
-                MOVE_LOC, \
-                RIG_GRP, \
-                SECONDARY_GRP, \
-                PARENT_JOINT, \
-                TARGET_MESH
-
-            SIDES = self.sides_input.text().strip()
-            MOVE_LOC = self.move_loc_input.text().strip()
-            RIG_GRP = self.rig_grp_input.text().strip()
-            SECONDARY_GRP = self.secondary_grp_input.text().strip()
-            PARENT_JOINT = self.parent_joint_input.text().strip()
-            TARGET_MESH = self.target_mesh_input.text().strip()
-
             # Call the build function
-            build_tweakers(
-                label=label, jnt_number=joint_count, do_sym=do_symmetry
-            )
+            self._building = True
+            try:
+                build_tweakers(
+                    label=label,
+                    jnt_number=joint_count,
+                    do_sym=do_symmetry,
+                    edges=self.get_validated_edges(),
+                    config=self.get_config(),
+                )
+            finally:
+                self._building = False
 
             # For testing - show success message
             msg = "Tweakers built successfully!\nLabel: {}\nJoints: {}\nSymmetry: {}".format(
@@ -906,6 +1078,74 @@ class TweakerUI(QtWidgets.QWidget):
                 "Error building tweakers: {}".format(str(e))
             )
 
+    def get_config(self):
+        """Scene names from the global variables inputs"""
+        return {
+            "sides": self.sides_input.text().strip(),
+            "move_loc": self.move_loc_input.text().strip(),
+            "rig_grp": self.rig_grp_input.text().strip(),
+            "secondary_grp": self.secondary_grp_input.text().strip(),
+            "parent_joint": self.parent_joint_input.text().strip(),
+            "target_mesh": self.target_mesh_input.text().strip(),
+        }
+
+    def add_to_queue(self):
+        """Stash the validated selection with the current parameters"""
+        label = self.label_input.text().strip()
+        if not self.validate_selection() or not label:
+            self._show_error_message("Select edges and set a label first")
+            return
+
+        self.queue.append({
+            "label": label,
+            "edges": self.get_validated_edges(),
+            "jnt_number": self.joint_spinbox.value(),
+            "do_sym": self.symmetry_checkbox.isChecked(),
+            "topology": dict(self.validated_topology),
+        })
+        self._update_queue_status()
+
+    def clear_queue(self):
+        self.queue = []
+        self._update_queue_status()
+
+    def _update_queue_status(self):
+        labels = [job["label"] for job in self.queue]
+        self.queue_label.setText(
+            "Queue: {}".format(", ".join(labels) if labels else "empty")
+        )
+        self.queue_build_btn.setEnabled(bool(self.queue))
+
+    def run_queue(self):
+        """Build all the queued setups"""
+        for job in self.queue:
+            if not self.check_topology(job.get("topology", {})):
+                self._show_error_message(
+                    "Mesh topology changed since {} was queued".format(
+                        job["label"]
+                    )
+                )
+                return
+
+        self._building = True
+        try:
+            timings = build_tweakers_queue(
+                self.queue, config=self.get_config()
+            )
+        except Exception as e:
+            self._show_error_message(
+                "Error building tweakers queue: {}".format(str(e))
+            )
+            return
+        finally:
+            self._building = False
+
+        lines = ["{}: {:.2f}s".format(*timing) for timing in timings]
+        self._show_success_message(
+            "Tweakers queue built!\n" + "\n".join(lines)
+        )
+        self.clear_queue()
+
     def _show_success_message(self, message):
         """Show success message"""
         msg_box = QtWidgets.QMessageBox(self)
@@ -2,20 +2,40 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import contextlib
+import json
 import os
 import re
+import time
 
+import maya.api.OpenMaya as om
+import numpy as np
 from maya import cmds
 from maya import mel
 from ngSkinTools2 import api
 from rig.utils import facial_rig
 
+from . import components
+from . import curve_sampling
+from . import geometry
+
 GROUPS_DATA = {
     "tool": "tool_mesh_grp",
     "clusters": "clusters_grp",
     "rivet": "rivet_grp",
     "temp": "TMP_grp",
+    "trash": "trash_grp",
 }
+MOVE_CLUSTER_NODES = ["M_move_cluster", "M_move_cluster_loc"]
+CLEAN_SCENE_STAGES = [
+    "disconnect_clusters_bpm",
+    "check_modeling_match",
+    "delete_trash",
+    "delete_unused_nodes",
+    "delete_unknown_plugins",
+    "clean_controllers_ratio",
+    "remove_data_structures",
+]
 CTRLS_SEARCH = "*_ctrl"
 CTRLS_EXCEPTION = ["M_global_ctrl"]
 ATTRIBUTES_TYPE = {"long", "short", "byte", "bool", "enum", "double", "float"}
@@ -26,8 +46,17 @@ COLOR_IDX = {
     "green": 14,
     "pink": 20,
 }
+MIRROR_INFLUENCE_GLOBS = [
+    ("L_*", "R_*"),
+    ("l_*", "r_*"),
+    ("lf_*", "rt_*"),
+    ("*_lf", "*_rt"),
+    ("M_*L_*", "M_*R_*"),
+    ("M_*M_*", "M_*M_*"),
+]
 CTRL_SHAPE_RATIO_ATTR = "ctrlShapeRatio{}"
 CTRL_SHAPE_RATIO_NODE_DATA_ATTR = CTRL_SHAPE_RATIO_ATTR.format("XYZ") + "Nodes"
+IDENTITY_MATRIX = [float(i % 5 == 0) for i in range(16)]
 DEFORMER_SUFFIX_ASSOCIATIONS = [
     {"suffix": "ffd1", "type": "ffd"},
     {"suffix": "cluster", "type": "cluster"},
@@ -50,6 +79,45 @@ SKINCLUSTER_SETTINGS = {
     "removeUnusedInfluence": False,
 }
 
+UNUSED_SWEEP_NODE_TYPES = [
+    "addDoubleLinear",
+    "animCurveUA",
+    "animCurveUL",
+    "animCurveUU",
+    "blendColors",
+    "blendMatrix",
+    "blendWeighted",
+    "clamp",
+    "composeMatrix",
+    "condition",
+    "curveFromMeshEdge",
+    "curveInfo",
+    "decomposeMatrix",
+    "distanceBetween",
+    "fourByFourMatrix",
+    "inverseMatrix",
+    "loft",
+    "multDoubleLinear",
+    "multMatrix",
+    "multiplyDivide",
+    "pairBlend",
+    "plusMinusAverage",
+    "pickMatrix",
+    "pointMatrixMult",
+    "pointOnCurveInfo",
+    "pointOnSurfaceInfo",
+    "remapValue",
+    "reverse",
+    "setRange",
+    "unitConversion",
+    "uvPin",
+    "vectorProduct",
+]
+
+MULTI_INDEX_PATTERN = re.compile(r"^(.*)\[(\d+)\]$")
+
+_INFLUENCES_MAPPING_CACHE = {}
+
 cmds.selectPref(trackSelectionOrder=True)
 
 
@@ -80,25 +148,90 @@ def apply_matrix(target, matrix):
     cmds.xform(target, matrix=matrix, worldSpace=True)
 
 
-def add_sym_joints_to_skincluster(replaces=("L_", "R_")):
-    added = []
-    selection = get_selection()
-    for mesh in selection:
-        skincluster, type = list_deformers(mesh, ["skinCluster"])
-        joints = cmds.skinCluster(
-            skincluster, query=True, influence=True, weightedInfluence=False
-        )
-        for jnt in joints:
-            if replaces[0] not in jnt:
-                continue
-            sym_jnt = jnt.replace(replaces[0], replaces[-1], 1)
-            if sym_jnt in joints:
-                continue
+def add_skincluster_influences(skincluster, influences, lock_weights=False):
+    """Add influences to a skinCluster in a single call
+
+    Influences are added with a weight of 0 and locked during the add, the
+    existing weights are not normalized again for each of them.
+
+    Args:
+        skincluster (str): skinCluster node
+        influences (list): joints to add, the existing ones are skipped
+        lock_weights (bool): keep the weights of the new influences locked
+
+    Return:
+        list: added influences
+    """
+    existing = cmds.skinCluster(skincluster, query=True, influence=True)
+    existing = set(existing or [])
+    influences = [x for x in influences if x not in existing]
+    if not influences:
+        return []
+
+    cmds.skinCluster(
+        skincluster,
+        edit=True,
+        addInfluence=influences,
+        weight=0,
+        lockWeights=True,
+    )
+    if not lock_weights:
+        for influence in influences:
+            cmds.setAttr("{}.lockInfluenceWeights".format(influence), 0)
+
+    return influences
+
+
+def add_sym_joints_to_skincluster(replaces=("L_", "R_"), meshes=None):
+    """Add the missing symmetrical joints to the skinCluster of meshes
+
+    The symmetrical joints of each skinCluster are gathered in a set and
+    added in a single call at zero weight, then unlocked so they can be
+    painted or mirrored right away.
+
+    Args:
+        replaces (tuple): side prefixes, source and symmetrical
+        meshes (list, optional): skinned meshes, the selection if not provided
+
+    Return:
+        dict: {mesh: added joints}
+    """
+    if meshes is None:
+        meshes = get_selection()
+
+    report = {}
+    for mesh in meshes:
+        skincluster, _ = list_deformers(mesh, ["skinCluster"])
+        if not skincluster:
+            cmds.warning(f"No skinCluster found on {mesh}", noContext=True)
+            continue
+
+        joints = set(
             cmds.skinCluster(
-                skincluster, edit=True, addInfluence=sym_jnt, lockWeights=True
+                skincluster[0],
+                query=True,
+                influence=True,
+                weightedInfluence=False,
             )
-            added.append(sym_jnt)
-    print(f"ADDED :\n{added}")
+            or []
+        )
+        sym_joints = {
+            x.replace(replaces[0], replaces[-1], 1)
+            for x in joints
+            if replaces[0] in x
+        }
+        sym_joints = sorted(sym_joints - joints)
+        if sym_joints:
+            sym_joints = cmds.ls(sym_joints, type="joint") or []
+
+        report[mesh] = add_skincluster_influences(skincluster[0], sym_joints)
+
+    for mesh, added in report.items():
+        print(f"{mesh}: {len(added)} added")
+        for jnt in added:
+            print(f"  {jnt}")
+
+    return report
 
 
 def add_custom_attr(obj, attr_name, attr_type, **kwargs):
@@ -189,14 +322,124 @@ def add_custom_attr(obj, attr_name, attr_type, **kwargs):
     return attr_name
 
 
-def build_cluster_plugs(cluster):
-    handle = cmds.listConnections(f"{cluster}.matrix", source=True)[0]
-    parent = get_parent(handle)
+def benchmark_ctrl_shape_ratio(count=100):
+    """Compare both create_ctrl_shape_ratio_attr modes on count controllers
+
+    Stand-in controllers are circles under two offsets, the evaluation is
+    timed by editing every ratio and pulling every shape.
 
-    input_plug = f"{parent}.worldInverseMatrix[0]"
-    dest_plug = f"{cluster}.bindPreMatrix"
+    Return:
+        dict: {mode: (created node count, evaluation duration in seconds)}
+    """
+    controllers = []
+    for i in range(count):
+        ctrl = cmds.circle(name="benchmark_{:03d}_ctrl".format(i))[0]
+        neg_offset = cmds.group(ctrl, name=ctrl + "_neg")
+        top_offset = cmds.group(neg_offset, name=ctrl + "_offset")
+        cmds.setAttr(top_offset + ".scaleX", -1 if i % 2 else 1)
+        controllers.append(ctrl)
+    shapes = ["{}.worldSpace[0]".format(get_shape(x)) for x in controllers]
+
+    results = {}
+    for mode, lightweight in [("legacy", False), ("lightweight", True)]:
+        with count_created_nodes() as created:
+            create_ctrl_shape_ratio_attr(controllers, lightweight=lightweight)
+
+        start = time.perf_counter()
+        for value in [2.0, 1.0]:
+            for ctrl in controllers:
+                for xyz in "XYZ":
+                    plug = "{}.{}".format(
+                        ctrl, CTRL_SHAPE_RATIO_ATTR.format(xyz)
+                    )
+                    cmds.setAttr(plug, value)
+            cmds.dgeval(shapes)
+        duration = time.perf_counter() - start
+
+        results[mode] = (len(created), duration)
+        print(
+            "{}: {} nodes, {:g} per controller, evaluation {:.3f}s".format(
+                mode, len(created), len(created) / count, duration
+            )
+        )
+        cleanup_ctrl_shape_ratio_attr(controllers)
 
-    return input_plug, dest_plug
+    cmds.delete([get_parent(get_parent(x)) for x in controllers])
+
+    return results
+
+
+def benchmark_hooks_on_curve(count=10):
+    """Compare create_hook_on_curve and create_hooks_on_curve
+
+    Builds count hooks on a stand-in curve with each method, for translate
+    only hooks and full hooks, then deletes every node they created.
+
+    Return:
+        dict: {(method, mode): (created node count, duration in seconds)}
+    """
+    curve = cmds.curve(
+        point=[(i, i % 2, 0) for i in range(8)], name="benchmark_hook_crv"
+    )
+    positions = np.linspace(0.0, 1.0, count).tolist()
+    modes = {
+        "translate": {
+            "attrs": ["translate"],
+            "curve_attrs": ["position"],
+            "inherits_transform": True,
+        },
+        "full": {},
+    }
+
+    def legacy(**kwargs):
+        return [
+            create_hook_on_curve(curve, position, arc_length=True, **kwargs)
+            for position in positions
+        ]
+
+    def batch(**kwargs):
+        return create_hooks_on_curve(
+            curve, positions, arc_length=True, **kwargs
+        )
+
+    results = {}
+    for method, function in [("single", legacy), ("batch", batch)]:
+        for mode, kwargs in modes.items():
+            handles = []
+            start = time.perf_counter()
+            with count_created_nodes(handles) as created:
+                function(**kwargs)
+            duration = time.perf_counter() - start
+
+            results[(method, mode)] = (len(created), duration)
+            print(
+                "{} {}: {} nodes, {:.3f}s".format(
+                    method, mode, len(created), duration
+                )
+            )
+            delete_created_nodes(handles)
+
+    cmds.delete(curve)
+
+    return results
+
+
+def bin_segments(nodes, count, pattern=r"_(\d+)_"):
+    """Split nodes in count bins of consecutive segment indices
+
+    Args:
+        nodes (list): chain nodes, named with a segment index
+        count (int): number of bins, one per controller for example
+        pattern (str): regex capturing the segment index in a node name
+
+    Return:
+        list: nodes list per bin
+    """
+    groups = group_by_index(nodes, pattern)
+    return [
+        [node for index in chunk for node in groups[index]]
+        for chunk in split_evenly(list(groups), count)
+    ]
 
 
 def colorize(obj, color="yellow"):
@@ -205,41 +448,73 @@ def colorize(obj, color="yellow"):
     cmds.setAttr("{}.overrideColor".format(obj), color_idx)
 
 
-def clean_facial_scene(delete_move_cluster=False):
-    disconnect_clusters_bpm()
-    facial_rig.check_modeling_match()
+def clean_facial_scene(delete_move_cluster=False, skip=(), report_path=None):
+    """Clean the facial scene before publish, stage by stage
 
-    # Delete unwanted
-    unwanted = (
-        get_children("trash_grp")
-        + [
-            "M_move_cluster",
-            "M_move_cluster_loc",
-        ]
-        if delete_move_cluster is True
-        else get_children("trash_grp")
-    )
-    [cmds.delete(obj) for obj in unwanted if cmds.objExists(obj)]
+    Stages run in CLEAN_SCENE_STAGES order and are timed, the ones returning
+    the nodes or items they removed are counted in the report.
 
-    # Extra clean
-    delete_unused_nodes()
-    delete_unknown_plugins()
-    clean_controllers_ratio()
+    Args:
+        delete_move_cluster (bool): also delete the move cluster and locator
+        skip (list): names of the stages to skip
+        report_path (str, optional): json file where to write the report
 
-    # Remove data structure (maya crap...)
-    cmds.dataStructure(removeAll=True)
+    Return:
+        dict: report with the duration and removed count of every stage
+    """
+    unknown = set(skip) - set(CLEAN_SCENE_STAGES)
+    if unknown:
+        cmds.error(
+            "Unknown clean stages: {}".format(", ".join(sorted(unknown))),
+            noContext=True,
+        )
+
+    stages = {
+        "disconnect_clusters_bpm": disconnect_clusters_bpm,
+        "check_modeling_match": facial_rig.check_modeling_match,
+        "delete_trash": lambda: delete_trash(delete_move_cluster),
+        "delete_unused_nodes": delete_unused_nodes,
+        "delete_unknown_plugins": delete_unknown_plugins,
+        "clean_controllers_ratio": clean_controllers_ratio,
+        "remove_data_structures": remove_data_structures,
+    }
+
+    report = {"duration": 0.0, "stages": []}
+    for name in CLEAN_SCENE_STAGES:
+        if name in skip:
+            print(f"Skipped {name}")
+            report["stages"].append({"name": name, "skipped": True})
+            continue
+
+        start = time.perf_counter()
+        result = stages[name]()
+        duration = time.perf_counter() - start
+
+        removed = len(result) if isinstance(result, (list, tuple)) else None
+        report["stages"].append({
+            "name": name,
+            "skipped": False,
+            "duration": duration,
+            "removed": removed,
+        })
+        report["duration"] += duration
+        print(f"  {name}: {duration:.3f}s")
+
+    print(f"Clean facial scene: {report['duration']:.3f}s")
+
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=4)
+
+    return report
 
 
 def clean_controllers_ratio():
-    attrs_to_check = ["ctrlShapeRatio" + xyz for xyz in "XYZ"]
-    to_clean = []
-    for node in get_controllers():
-        for attr in attrs_to_check:
-            if not cmds.attributeQuery(attr, node=node, exists=True):
-                continue
-        to_clean.add(node)
+    """Clean the ratio setup of every node of the scene carrying it"""
+    plugs = cmds.ls("*." + CTRL_SHAPE_RATIO_NODE_DATA_ATTR, recursive=True)
+    controllers = [x.rsplit(".", 1)[0] for x in plugs or []]
 
-    cleanup_ctrl_shape_ratio_attr(to_clean)
+    return cleanup_ctrl_shape_ratio_attr(controllers) if controllers else []
 
 
 def create_ng_node(mesh):
@@ -249,17 +524,43 @@ def create_ng_node(mesh):
 
 
 def create_joints_on_center_faces():
+    """Create a joint at the center of each selected face
+
+    Joints are oriented and scaled like the mesh transform, as the average
+    match of the face vertices did. They are created by one MDagModifier
+    and placed by API calls, this creation is not undoable.
+
+    Return:
+        list: created joints
+    """
     selection = cmds.ls(orderedSelection=True)
-    for face in selection:
-        vertices = cmds.polyInfo(face, faceToVertex=True)[0]
-        vertices = vertices.strip().split()[2:]
-        vertices = list(set(vertices))
-        vertices = [
-            "{}.vtx[{}]".format(face.split(".")[0], v) for v in vertices
-        ]
-        cmds.select(clear=True)
-        joint = cmds.joint()
-        xform_average_match_transforms(joint, vertices)
+    faces, others = geometry.parse_components(selection)
+
+    matrices = []
+    for (node, kind), indices in faces.items():
+        if kind != "f":
+            continue
+        world_matrix = geometry.get_dag_path(node).inclusiveMatrix()
+        for center in geometry.get_faces_centers(node, indices).tolist():
+            matrix = om.MTransformationMatrix(world_matrix)
+            matrix.setTranslation(om.MVector(center), om.MSpace.kWorld)
+            matrices.append(matrix)
+    if not matrices:
+        return []
+
+    modifier = om.MDagModifier()
+    nodes = [modifier.createNode("joint") for _ in matrices]
+    modifier.doIt()
+
+    joints = []
+    for node, matrix in zip(nodes, matrices):
+        fn = om.MFnTransform(node)
+        fn.setTransformation(matrix)
+        joints.append(fn.partialPathName())
+
+    cmds.select(joints)
+
+    return joints
 
 
 def create_locator(
@@ -289,8 +590,7 @@ def create_locator(
 
     """
     loc = cmds.spaceLocator(name=name)[0]
-    scales = ["localScale" + y for y in "XYZ"]
-    [cmds.setAttr("{}.{}".format(loc, s), scale) for s in scales]
+    cmds.setAttr("{}.localScale".format(loc), scale, scale, scale)
 
     if parent:
         if match_to == "parent":
@@ -320,16 +620,92 @@ def create_locator(
     return loc
 
 
-def create_locator_on_all_ctrls():
+def create_locators(
+    names,
+    parent=None,
+    targets=None,
+    follow=None,
+    color="yellow",
+    scale=1,
+):
+    """Create many locators sharing their settings
+
+    A prototype locator gets the shared attributes, parent and follow
+    settings once, the other locators are duplicates of it.
+
+    Args:
+        names (list): locator names
+        parent (str, optional): parent of the locators
+        targets (list, optional): nodes matched by the locators, one per name
+        follow (str, optional): how locators follow their target,
+            None matches the target once,
+            "matrix" connects worldMatrix to offsetParentMatrix,
+            "constraint" adds a parentConstraint.
+        color (str): locators color
+        scale (float): locators size
+
+    Return:
+        list: locators
+    """
+    if follow not in {None, "matrix", "constraint"}:
+        cmds.error(f"Unknown follow mode: {follow}", noContext=True)
+    if targets is not None and len(targets) != len(names):
+        cmds.error("One target is expected per locator name", noContext=True)
+    if not names:
+        return []
+
+    prototype = cmds.spaceLocator(name=names[0])[0]
+    cmds.setAttr(f"{prototype}.localScale", scale, scale, scale)
+    if color:
+        colorize(prototype, color)
+    if follow == "matrix":
+        cmds.setAttr(f"{prototype}.inheritsTransform", False)
+    if parent:
+        prototype = cmds.parent(prototype, parent, relative=True)[0]
+
+    locators = [prototype]
+    for name in names[1:]:
+        locators.append(cmds.duplicate(prototype, name=name)[0])
+
+    if not targets:
+        return locators
+
+    if follow == "matrix":
+        connect_plugs({
+            f"{target}.worldMatrix[0]": f"{loc}.offsetParentMatrix"
+            for target, loc in zip(targets, locators)
+        })
+    elif follow == "constraint":
+        for target, loc in zip(targets, locators):
+            cmds.parentConstraint(target, loc)
+    else:
+        for target, loc in zip(targets, locators):
+            matrix_match_transforms(loc, target)
+
+    return locators
+
+
+def create_locator_on_all_ctrls(follow="matrix"):
+    """Create a locator following every controller
+
+    Args:
+        follow (str): "matrix" or "constraint", see create_locators
+
+    Return:
+        list: locators
+    """
     if not cmds.objExists(GROUPS_DATA["temp"]):
         create_nodes(["transform"], GROUPS_DATA["temp"], type_suffix=False)
 
-    for ctrl in get_controllers():
-        name = ctrl + "_locator"
-        loc = create_locator(
-            name, GROUPS_DATA["temp"], color="yellow", scale=2
-        )
-        cmds.parentConstraint(ctrl, loc)
+    controllers = get_controllers()
+    return create_locators(
+        [ctrl + "_locator" for ctrl in controllers],
+        GROUPS_DATA["temp"],
+        targets=controllers,
+        follow=follow,
+        color="yellow",
+        scale=2,
+    )
 
 
 def create_sphere():
@@ -354,6 +730,33 @@ def create_shapeorig(obj):
     return cmds.deformableShape(obj, createOriginalGeometry=True)[0]
 
 
+@contextlib.contextmanager
+def count_created_nodes(handles=None):
+    """Record the type of every node created inside the context
+
+    Temporary nodes deleted before leaving the context are counted too.
+
+    Args:
+        handles (list, optional): receives an MObjectHandle per created
+            node, see delete_created_nodes
+
+    Yield:
+        list: created node types
+    """
+    created = []
+
+    def node_added(node, client_data):
+        created.append(om.MFnDependencyNode(node).typeName)
+        if handles is not None:
+            handles.append(om.MObjectHandle(node))
+
+    callback = om.MDGMessage.addNodeAddedCallback(node_added, "dependNode")
+    try:
+        yield created
+    finally:
+        om.MMessage.removeCallback(callback)
+
+
 def create_bs():
     selection = get_selection()
     if not len(selection) > 1:
@@ -394,6 +797,45 @@ def create_blendshape_by_prefix():
         create_blendshape(mesh, match)
 
 
+def _get_hook_name(curve, child=None, remove_child_suffix=True):
+    name = curve + "_crv"
+    if child:
+        name = "{}_crv".format(child)
+        if remove_child_suffix:
+            name = "{}_crv".format("_".join(child.split("_")[:-1]))
+
+    return name
+
+
+def _parent_to_hook(
+    child, hook, attrs, reset=True, relative=True, child_axis_order="X-YZ"
+):
+    child_parent = get_parent(child)
+    cmds.parent(child, hook, relative=relative)
+    if child_parent:
+        cmds.parent(hook, child_parent)
+
+    if reset:
+        reset_attrs = attrs
+        if cmds.objectType(child) == "joint":
+            reset_attrs = list(attrs) + ["jointOrient"]
+        reset_transforms(child, reset_attrs)
+
+        axis_to_rotation = {
+            "X-YZ": (0, 0, 0),
+            "XZY": (90, 0, 0),
+            "X-Z-Y": (-90, 0, 0),
+            "Z-Y-X": (0, 90, 0),
+            "-Z-YX": (0, -90, 0),
+            "-Y-XZ": (0, 0, 90),
+            "YXZ": (0, 0, -90),
+            "Y-X-Z": (180, 0, 90),
+            "XY-Z": (180, 0, 0),
+        }
+        rot = axis_to_rotation[child_axis_order]
+        cmds.xform(child, rotation=rot, objectSpace=True)
+
+
 def create_hook_on_curve(
     curve,
     position=0.0,
@@ -405,13 +847,20 @@ def create_hook_on_curve(
     remove_child_suffix=True,
     child_axis_order="X-YZ",
     relative=True,
+    arc_length=False,
 ):
-    name = curve + "_crv"
-    if child:
-        name = "{}_crv".format(child)
-        if remove_child_suffix:
-            name = "{}_crv".format("_".join(child.split("_")[:-1]))
+    """Create a transform following a curve at a parameter
+
+    Args:
+        position (float): curve parameter, or length ratio from 0 to 1
+            when arc_length is True
+        arc_length (bool): place by arc length, parameters of uneven
+            curves bunch up where the CVs are close
+    """
+    if arc_length:
+        position = curve_sampling.get_parameter_at_ratio(curve, position)
 
+    name = _get_hook_name(curve, child, remove_child_suffix)
     hook = create_nodes(["transform"], "{}_hook_grp".format(name), False, True)
     nodes = create_nodes(
         [
@@ -459,34 +908,152 @@ def create_hook_on_curve(
     connect_plugs(connections_data)
 
     if child:
-        child_parent = get_parent(child)
-        cmds.parent(child, hook, relative=relative)
-        if child_parent:
-            cmds.parent(hook, child_parent)
-
-        if reset:
-            reset_attrs = attrs
-            if cmds.objectType(child) == "joint":
-                reset_attrs = list(attrs) + ["jointOrient"]
-            reset_transforms(child, reset_attrs)
-
-            axis_to_rotation = {
-                "X-YZ": (0, 0, 0),
-                "XZY": (90, 0, 0),
-                "X-Z-Y": (-90, 0, 0),
-                "Z-Y-X": (0, 90, 0),
-                "-Z-YX": (0, -90, 0),
-                "-Y-XZ": (0, 0, 90),
-                "YXZ": (0, 0, -90),
-                "Y-X-Z": (180, 0, 90),
-                "XY-Z": (180, 0, 0),
-            }
-            rot = axis_to_rotation[child_axis_order]
-            cmds.xform(child, rotation=rot, objectSpace=True)
+        _parent_to_hook(child, hook, attrs, reset, relative, child_axis_order)
 
     return hook
 
 
+def create_hooks_on_curve(
+    curve,
+    positions,
+    children=None,
+    reset=True,
+    attrs=("translate", "rotate", "scale"),
+    curve_attrs=("position", "normalizedNormal", "normalizedTangent"),
+    inherits_transform=False,
+    remove_child_suffix=True,
+    child_axis_order="X-YZ",
+    relative=True,
+    arc_length=False,
+):
+    """Create transforms following a curve with a light graph per hook
+
+    Translate only hooks get a pointOnCurveInfo and a pointMatrixMult by
+    their parentInverseMatrix. Full hooks not inheriting transforms get an
+    orthonormal fourByFourMatrix, its third axis crossing the normal and the
+    tangent, compensated by their parentInverseMatrix in their
+    offsetParentMatrix, without decomposeMatrix. Other hooks keep the
+    create_hook_on_curve graph. Connections are made in one pass.
+
+    Args:
+        positions (list): curve parameters, or length ratios from 0 to 1
+            when arc_length is True
+        children (list, optional): child per position
+
+    Return:
+        list: hooks in positions order
+    """
+    children = children or [None] * len(positions)
+    if arc_length:
+        table = curve_sampling.get_arc_length_table(curve)
+        ratios = np.asarray(positions, dtype=np.float64)
+        positions = table.get_parameters(ratios * table.length).tolist()
+
+    match_indices = {
+        "position": 3,
+        "normalizedNormal": 0,
+        "normalizedTangent": 1,
+    }
+    translate_only = set(attrs) == {"translate"} and "position" in curve_attrs
+    # The offsetParentMatrix drives the whole transform, scale included
+    matrix_only = (
+        set(attrs) == {"translate", "rotate", "scale"}
+        and set(match_indices) <= set(curve_attrs)
+        and not inherits_transform
+    )
+    if not translate_only and not matrix_only:
+        return [
+            create_hook_on_curve(
+                curve,
+                position,
+                child,
+                reset,
+                attrs,
+                curve_attrs,
+                inherits_transform,
+                remove_child_suffix,
+                child_axis_order,
+                relative,
+            )
+            for position, child in zip(positions, children)
+        ]
+
+    hooks = []
+    locked_data = {}
+    values_data = {}
+    connections_data = {curve + ".worldSpace[0]": []}
+    for position, child in zip(positions, children):
+        name = _get_hook_name(curve, child, remove_child_suffix)
+        hook = create_nodes(
+            ["transform"], "{}_hook_grp".format(name), False, True
+        )
+        posi = cmds.createNode(
+            "pointOnCurveInfo", name="{}_posi".format(name), skipSelect=True
+        )
+        connections_data[curve + ".worldSpace[0]"].append(posi + ".inputCurve")
+        locked_data[posi + ".parameter"] = position
+        if not inherits_transform:
+            locked_data[hook + ".inheritsTransform"] = 0
+
+        # Same parentInverseMatrix compensation as create_hook_on_curve
+        if translate_only:
+            if child:
+                matrix_match_transforms(hook, child)
+            pmm = cmds.createNode(
+                "pointMatrixMult", name="{}_pmm".format(name), skipSelect=True
+            )
+            connections_data.update({
+                posi + ".position": pmm + ".inPoint",
+                hook + ".parentInverseMatrix[0]": pmm + ".inMatrix",
+                pmm + ".output": hook + ".translate",
+            })
+        else:
+            fbfmx = cmds.createNode(
+                "fourByFourMatrix",
+                name="{}_fbmx".format(name),
+                skipSelect=True,
+            )
+            vector = cmds.createNode(
+                "vectorProduct", name="{}_vp".format(name), skipSelect=True
+            )
+            mmx = cmds.createNode(
+                "multMatrix", name="{}_mx".format(name), skipSelect=True
+            )
+            values_data[vector + ".operation"] = 2
+            values_data[vector + ".normalizeOutput"] = 1
+            for surf_attr, indice in match_indices.items():
+                for i, axis in enumerate("XYZ"):
+                    connections_data[
+                        "{}.{}{}".format(posi, surf_attr, axis)
+                    ] = "{}.in{}{}".format(fbfmx, indice, i)
+            for i, axis in enumerate("XYZ"):
+                connections_data["{}.output{}".format(vector, axis)] = (
+                    "{}.in2{}".format(fbfmx, i)
+                )
+            connections_data.update({
+                posi + ".normalizedNormal": vector + ".input1",
+                posi + ".normalizedTangent": vector + ".input2",
+                fbfmx + ".output": mmx + ".matrixIn[0]",
+                hook + ".parentInverseMatrix[0]": mmx + ".matrixIn[1]",
+                mmx + ".matrixSum": hook + ".offsetParentMatrix",
+            })
+
+        hooks.append(hook)
+
+    for plug, value in locked_data.items():
+        cmds.setAttr(plug, value, lock=True)
+    set_plugs(values_data)
+    connect_plugs(connections_data)
+
+    for hook, child in zip(hooks, children):
+        if child:
+            _parent_to_hook(
+                child, hook, attrs, reset, relative, child_axis_order
+            )
+
+    return hooks
+
+
 def create_nodes(nodes, label, type_suffix=True, return_str=False):
     created = {}
     for node in nodes:
@@ -735,116 +1302,250 @@ def create_shrinkwrap(mesh, target, name, **kwargs):
     return [shrink_wrap]
 
 
-def create_ctrl_shape_ratio_attr():
+def create_ctrl_shape_ratio_attr(controllers=None, lightweight=False):
+    """Add ratio attributes scaling the top offset of controllers
+
+    The controller shapes are scaled back to keep their size. All the
+    connections are made in one pass.
+
+    Args:
+        controllers (list, optional): controllers, the selection if empty
+        lightweight (bool): drive the top offset offsetParentMatrix and the
+            shape compensation with one composeMatrix, without any
+            multiplyDivide
+
+    Return:
+        list: created nodes
+    """
     selection = get_selection()
-    for each in selection:
-        shape_orig_plug = create_shapeorig(each)
-        shape_orig = shape_orig_plug.split(".")[0]
-        neg_offset = get_parent(each)
-        top_offset = get_parent(neg_offset)
-        shape = get_shape(each)
-
-        plugs_data = {}
-        nodes = create_nodes(
-            ["composeMatrix", "transformGeometry"], each + "_ctrlShapeRatio"
+    controllers = controllers or selection
+
+    plugs_data = {}
+    all_created = []
+    for each in controllers:
+        plug = "{}.{}".format(each, CTRL_SHAPE_RATIO_NODE_DATA_ATTR)
+        if cmds.objExists(plug):
+            continue
+
+        if lightweight:
+            created = _create_ctrl_shape_ratio_light_nodes(each, plugs_data)
+        else:
+            created = _create_ctrl_shape_ratio_nodes(each, plugs_data)
+        all_created.extend(created)
+
+        # stamp temp nodes
+        data = ",".join(created)
+        attr = add_custom_attr(
+            each, CTRL_SHAPE_RATIO_NODE_DATA_ATTR, "string", keyable=False
         )
+        cmds.setAttr("{}.{}".format(each, attr), data, type="string")
 
-        created = list(nodes.values())
+    connect_plugs(plugs_data)
+    cmds.select(selection)
 
-        for xyz in "XYZ":
-            plug = "{}.{}".format(each, CTRL_SHAPE_RATIO_ATTR.format(xyz))
-            if cmds.objExists(plug):
-                continue
+    return list(dict.fromkeys(all_created))
 
-            default_value = cmds.getAttr("{}.scale{}".format(top_offset, xyz))
-            negative_sign = default_value <= 0
-            absolute_default_value = abs(default_value)
 
-            add_custom_attr(
-                each,
-                CTRL_SHAPE_RATIO_ATTR.format(xyz),
-                "double",
-                min=0.01,
-                max=100,
-                default=absolute_default_value,
-            )
+def _create_ctrl_shape_ratio_nodes(ctrl, plugs_data):
+    shape_orig_plug = create_shapeorig(ctrl)
+    shape_orig = shape_orig_plug.split(".")[0]
+    neg_offset = get_parent(ctrl)
+    top_offset = get_parent(neg_offset)
+    shape = get_shape(ctrl)
 
-            mults = create_nodes(
-                ["multiplyDivide", "multiplyDivide"],
-                "{}_ctrlShapeRatio_{}".format(each, xyz),
-            )
+    nodes = create_nodes(
+        ["composeMatrix", "transformGeometry"], ctrl + "_ctrlShapeRatio"
+    )
 
-            cmds.setAttr(
-                mults["multiply"] + ".input2X", -1 if negative_sign else 1
-            )
+    created = list(nodes.values())
 
-            cmds.setAttr(
-                mults["multiply1"] + ".input1X", absolute_default_value
-            )
-            cmds.setAttr(mults["multiply1"] + ".operation", 2)
+    for xyz in "XYZ":
+        plug = "{}.{}".format(ctrl, CTRL_SHAPE_RATIO_ATTR.format(xyz))
+        if cmds.objExists(plug):
+            continue
 
-            plugs_data[plug] = [
-                mults["multiply1"] + ".input2X",
-                "{}.input1{}".format(mults["multiply"], xyz),
-            ]
-            plugs_data[mults["multiply1"] + ".outputX"] = (
-                "{}.inputScale{}".format(nodes["compose"], xyz)
-            )
-            plugs_data["{}.output{}".format(mults["multiply"], xyz)] = (
-                "{}.scale{}".format(top_offset, xyz),
-            )
-            created += list(mults.values()) + [shape_orig]
+        default_value = cmds.getAttr("{}.scale{}".format(top_offset, xyz))
+        negative_sign = default_value <= 0
+        absolute_default_value = abs(default_value)
 
-        plugs_data[nodes["compose"] + ".outputMatrix"] = (
-            nodes["transform"] + ".transform"
+        add_custom_attr(
+            ctrl,
+            CTRL_SHAPE_RATIO_ATTR.format(xyz),
+            "double",
+            min=0.01,
+            max=100,
+            default=absolute_default_value,
         )
-        plugs_data[shape_orig_plug] = nodes["transform"] + ".inputGeometry"
-        plugs_data[nodes["transform"] + ".outputGeometry"] = shape + ".create"
 
-        connect_plugs(plugs_data)
+        mults = create_nodes(
+            ["multiplyDivide", "multiplyDivide"],
+            "{}_ctrlShapeRatio_{}".format(ctrl, xyz),
+        )
 
-        # stamp temp nodes
-        data = ",".join(created)
+        cmds.setAttr(
+            mults["multiply"] + ".input2X", -1 if negative_sign else 1
+        )
+
+        cmds.setAttr(mults["multiply1"] + ".input1X", absolute_default_value)
+        cmds.setAttr(mults["multiply1"] + ".operation", 2)
+
+        plugs_data[plug] = [
+            mults["multiply1"] + ".input2X",
+            "{}.input1{}".format(mults["multiply"], xyz),
+        ]
+        plugs_data[mults["multiply1"] + ".outputX"] = "{}.inputScale{}".format(
+            nodes["compose"], xyz
+        )
+        plugs_data["{}.output{}".format(mults["multiply"], xyz)] = (
+            "{}.scale{}".format(top_offset, xyz),
+        )
+        created += list(mults.values()) + [shape_orig]
+
+    plugs_data[nodes["compose"] + ".outputMatrix"] = (
+        nodes["transform"] + ".transform"
+    )
+    plugs_data[shape_orig_plug] = nodes["transform"] + ".inputGeometry"
+    plugs_data[nodes["transform"] + ".outputGeometry"] = shape + ".create"
+
+    return created
+
+
+def _create_ctrl_shape_ratio_light_nodes(ctrl, plugs_data):
+    shape_orig_plug = create_shapeorig(ctrl)
+    shape_orig = shape_orig_plug.split(".")[0]
+    top_offset = get_parent(get_parent(ctrl))
+    shape = get_shape(ctrl)
+
+    nodes = create_nodes(
+        ["composeMatrix", "transformGeometry"], ctrl + "_ctrlShapeRatio"
+    )
+    created = list(nodes.values()) + [shape_orig]
+
+    # The top offset keeps the sign, its offsetParentMatrix the ratio. The
+    # original shape is baked at the offset scale, the transformGeometry
+    # divides it by the ratio with the same matrix inverted.
+    defaults = cmds.getAttr(top_offset + ".scale")[0]
+    absolute_defaults = [abs(x) for x in defaults]
+    cmds.setAttr(
+        top_offset + ".scale", *[-1 if x <= 0 else 1 for x in defaults]
+    )
+    if absolute_defaults != [1.0, 1.0, 1.0]:
+        points = geometry.get_curve_points(shape_orig)
+        geometry.set_curve_points(shape_orig, points * absolute_defaults)
+    cmds.setAttr(nodes["transform"] + ".invertTransform", 1)
+
+    for xyz, default in zip("XYZ", absolute_defaults):
         attr = add_custom_attr(
-            each, CTRL_SHAPE_RATIO_NODE_DATA_ATTR, "string", keyable=False
+            ctrl,
+            CTRL_SHAPE_RATIO_ATTR.format(xyz),
+            "double",
+            min=0.01,
+            max=100,
+            default=default,
+        )
+        plugs_data["{}.{}".format(ctrl, attr)] = "{}.inputScale{}".format(
+            nodes["compose"], xyz
         )
-        cmds.setAttr("{}.{}".format(each, attr), data, type="string")
 
-    cmds.select(selection)
+    plugs_data[nodes["compose"] + ".outputMatrix"] = [
+        top_offset + ".offsetParentMatrix",
+        nodes["transform"] + ".transform",
+    ]
+    plugs_data[shape_orig_plug] = nodes["transform"] + ".inputGeometry"
+    plugs_data[nodes["transform"] + ".outputGeometry"] = shape + ".create"
+
+    return created
 
 
 def cleanup_ctrl_shape_ratio_attr(controllers=None):
+    """Remove the ratio setup of controllers in bulk
+
+    Shapes are disconnected and the recorded nodes deleted in one call.
+    The ratio of lightweight setups is baked in the top offset scale.
+
+    Return:
+        list: cleaned controllers
+    """
     if not controllers:
         controllers = get_selection()
-    for each in controllers:
-        plug = "{}.{}".format(each, CTRL_SHAPE_RATIO_NODE_DATA_ATTR)
-        if not cmds.objExists(plug):
-            continue
+    if not controllers:
+        return []
 
-        dest_ctrl_shape_plug = each + ".create"
-        src_ctrl_shape_plug = (
-            cmds.listConnections(
-                dest_ctrl_shape_plug,
-                source=True,
-                destination=False,
-                plugs=True,
-            )
-            or []
+    data_plugs = [
+        "{}.{}".format(x, CTRL_SHAPE_RATIO_NODE_DATA_ATTR) for x in controllers
+    ]
+    data_plugs = cmds.ls(data_plugs) or []
+    cleaned = [x.rsplit(".", 1)[0] for x in data_plugs]
+    if not cleaned:
+        return []
+
+    connections = (
+        cmds.listConnections(
+            [x + ".create" for x in cleaned],
+            source=True,
+            destination=False,
+            plugs=True,
+            connections=True,
+        )
+        or []
+    )
+    for dest_plug, src_plug in zip(connections[::2], connections[1::2]):
+        cmds.disconnectAttr(src_plug, dest_plug)
+
+    nodes = []
+    for plug in data_plugs:
+        nodes.extend((cmds.getAttr(plug) or "").split(","))
+    nodes = list(dict.fromkeys(x for x in nodes if x))
+    nodes = cmds.ls(nodes) if nodes else []
+
+    matrix_connections = (
+        cmds.listConnections(
+            [
+                get_parent(get_parent(x)) + ".offsetParentMatrix"
+                for x in cleaned
+            ],
+            source=True,
+            destination=False,
+            plugs=True,
+            connections=True,
+        )
+        or []
+    )
+    for dest_plug, src_plug in zip(
+        matrix_connections[::2], matrix_connections[1::2]
+    ):
+        compose = src_plug.split(".")[0]
+        if compose not in nodes:
+            continue
+        top_offset = dest_plug.rsplit(".", 1)[0]
+        ratios = cmds.getAttr(compose + ".inputScale")[0]
+        signs = cmds.getAttr(top_offset + ".scale")[0]
+        cmds.disconnectAttr(src_plug, dest_plug)
+        cmds.setAttr(dest_plug, IDENTITY_MATRIX, type="matrix")
+        cmds.setAttr(
+            top_offset + ".scale", *[x * y for x, y in zip(signs, ratios)]
         )
-        if src_ctrl_shape_plug:
-            print(src_ctrl_shape_plug[0], "->", dest_ctrl_shape_plug)
-            cmds.disconnectAttr(src_ctrl_shape_plug[0], dest_ctrl_shape_plug)
-
-        # all other nodes
-        nodes = cmds.getAttr(
-            "{}.{}".format(each, CTRL_SHAPE_RATIO_NODE_DATA_ATTR)
-        ).split(",")
+    if nodes:
         cmds.delete(nodes)
 
-        cmds.deleteAttr("{}.{}".format(each, CTRL_SHAPE_RATIO_NODE_DATA_ATTR))
+    attributes = list(data_plugs)
+    for each in cleaned:
         for xyz in "XYZ":
-            plug = "{}.{}".format(each, CTRL_SHAPE_RATIO_ATTR.format(xyz))
-            cmds.deleteAttr(plug)
+            attributes.append(
+                "{}.{}".format(each, CTRL_SHAPE_RATIO_ATTR.format(xyz))
+            )
+    attributes = cmds.ls(attributes) or []
+    for plug in attributes:
+        cmds.deleteAttr(plug)
+
+    print(
+        "Cleaned {} controllers: {} disconnected shapes, {} deleted nodes, "
+        "{} removed attributes".format(
+            len(cleaned), len(connections) // 2, len(nodes), len(attributes)
+        )
+    )
+
+    return cleaned
 
 
 def connect_plugs(data):
@@ -931,6 +1632,29 @@ def copy_skincluster(source, target, method="closestPoint"):
     )
 
 
+def delete_created_nodes(handles):
+    """Delete the nodes recorded by count_created_nodes still in the scene
+
+    Return:
+        list: deleted nodes
+    """
+    nodes = []
+    for handle in handles:
+        if not handle.isAlive() or not handle.isValid():
+            continue
+        node = handle.object()
+        if node.hasFn(om.MFn.kDagNode):
+            nodes.append(om.MFnDagNode(node).fullPathName())
+        else:
+            nodes.append(om.MFnDependencyNode(node).name())
+
+    nodes = cmds.ls(nodes) if nodes else []
+    if nodes:
+        cmds.delete(nodes)
+
+    return nodes
+
+
 def delete_ng_nodes():
     for each in ("ngst2MeshDisplay", "ngst2SkinLayerData", "ngSkinLayerData"):
         nodes = cmds.ls(type=each)
@@ -943,32 +1667,100 @@ def delete_tmp():
         cmds.delete(GROUPS_DATA["temp"])
 
 
+def delete_trash(delete_move_cluster=False):
+    """Delete the children of the trash group in one call
+
+    Args:
+        delete_move_cluster (bool): also delete the move cluster and locator
+
+    Return:
+        list: deleted nodes
+    """
+    nodes = get_children(GROUPS_DATA["trash"])
+    if delete_move_cluster:
+        nodes += MOVE_CLUSTER_NODES
+    nodes = cmds.ls(nodes) if nodes else []
+    if nodes:
+        cmds.delete(nodes)
+
+    return nodes
+
+
 def delete_unknown_plugins():
-    for each in cmds.unknownPlugin(query=True, list=True) or []:
+    plugins = cmds.unknownPlugin(query=True, list=True) or []
+    for each in plugins:
         cmds.unknownPlugin(each, remove=True)
 
+    return plugins
+
+
+def delete_unused_nodes(dry_run=False, node_types=UNUSED_SWEEP_NODE_TYPES):
+    """Delete the utility nodes driving nothing, see get_unused_nodes
+
+    Args:
+        dry_run (bool): only print the nodes which would be deleted
+        node_types (list): node types allowed to be swept
+
+    Return:
+        list: unused nodes
+    """
+    start = time.perf_counter()
+    nodes = get_unused_nodes(node_types)
+
+    if dry_run:
+        for node in nodes:
+            print("  {}".format(node))
+    elif nodes:
+        cmds.lockNode(nodes, lock=False)
+        cmds.delete(nodes)
 
-def delete_unused_nodes():
-    mel.eval("MLdeleteUnused;")
+    print(
+        "{} unused nodes {} in {:.3f}s".format(
+            len(nodes),
+            "found" if dry_run else "deleted",
+            time.perf_counter() - start,
+        )
+    )
+    return nodes
 
 
 def delete_unknown_nodes():
-    for each in (cmds.ls(type="unknown") + cmds.ls(type="unknownDag")) or []:
-        if not cmds.objExists(each):
-            continue
-        cmds.lockNode(each, lock=False)
-        cmds.delete(each)
+    nodes = cmds.ls(type=["unknown", "unknownDag"]) or []
+    if nodes:
+        cmds.lockNode(nodes, lock=False)
+        cmds.delete(nodes)
 
+    return nodes
 
-def disconnect_clusters_bpm(clusters=None):
-    if not clusters:
-        clusters = get_clusters()
-    for cluster in clusters:
-        input_plug, dest_plug = build_cluster_plugs(cluster)
-        try:
-            cmds.disconnectAttr(input_plug, dest_plug)
-        except Exception as e:
-            cmds.warning(e)
+
+def disconnect_clusters_bpm(clusters=None, graph=None):
+    """Disconnect the bindPreMatrix of clusters, see get_clusters_graph
+
+    Only a connection from the handle parent worldInverseMatrix is removed,
+    other sources are kept. Every disconnection is done by one MDGModifier.
+
+    Args:
+        clusters (list, optional): clusters, all of the clusters group if
+            not provided
+        graph (dict, optional): result of get_clusters_graph
+
+    Return:
+        dict: the clusters graph, to reconnect with reconnect_clusters_bpm
+    """
+    if graph is None:
+        graph = get_clusters_graph(clusters)
+
+    modifier = om.MDGModifier()
+    for data in graph.values():
+        if not data["connected"] or not data["input_plug"]:
+            continue
+        source = geometry.get_plug(data["connected"])
+        if source != geometry.get_plug(data["input_plug"]):
+            continue
+        modifier.disconnect(source, geometry.get_plug(data["dest_plug"]))
+    modifier.doIt()
+
+    return graph
 
 
 def duplicate_node(
@@ -1107,6 +1899,27 @@ def get_selection_flatten():
     return cmds.ls(selection=True, flatten=True)
 
 
+def get_selection_components(kind=None):
+    """Selected components as ComponentSet, without flattening"""
+    return components.ComponentSet.from_selection(kind)
+
+
+def group_by_index(nodes, pattern=r"_(\d+)_"):
+    """Group nodes by the index parsed from their name, in one pass
+
+    Return:
+        dict: {index: [nodes]} sorted by index, unmatched nodes are skipped
+    """
+    regex = re.compile(pattern)
+    groups = {}
+    for node in nodes:
+        match = regex.search(node)
+        if match:
+            groups.setdefault(int(match.group(1)), []).append(node)
+
+    return dict(sorted(groups.items()))
+
+
 def get_shape(obj):
     shapes = cmds.listRelatives(obj, shapes=True)
     if not shapes:
@@ -1114,6 +1927,29 @@ def get_shape(obj):
     return shapes[0]
 
 
+def get_skincluster_influences(skincluster):
+    """Get the influences of a skinCluster with their logical indices
+
+    Return:
+        dict: {influence: logical index}
+    """
+    connections = (
+        cmds.listConnections(
+            skincluster + ".matrix",
+            source=True,
+            destination=False,
+            connections=True,
+        )
+        or []
+    )
+    influences = {}
+    for plug, influence in zip(connections[::2], connections[1::2]):
+        match = re.search(r"\[(\d+)\]$", plug)
+        influences[influence] = int(match.group(1))
+
+    return influences
+
+
 def get_children(node, typ=None):
     """Get all child transforms of a node
 
@@ -1138,6 +1974,10 @@ def get_children(node, typ=None):
     return childs
 
 
+def get_multi_indices(plug):
+    return cmds.getAttr(plug, multiIndices=True) or []
+
+
 def get_parent(node):
     parents = cmds.listRelatives(node, parent=True) or []
     if parents:
@@ -1148,18 +1988,84 @@ def get_parent(node):
 
 
 def get_clusters(cluster_group=GROUPS_DATA["clusters"]):
-    clusters = []
-    children = cmds.listRelatives(cluster_group, allDescendents=True)
-    for child in children:
-        typ = cmds.nodeType(child)
-        if typ != "clusterHandle":
-            continue
-        name = child
-        if "HandleShape" in child:
-            name = child.replace("HandleShape", "")
-        clusters.append(name)
+    children = cmds.listRelatives(
+        cluster_group, allDescendents=True, type="clusterHandle"
+    )
+    return [x.replace("HandleShape", "") for x in children or []]
+
+
+def get_clusters_graph(clusters=None):
+    """Get the handle and bindPreMatrix connection of clusters in bulk
+
+    Handles come from one listConnections on the matrix plugs, their parent
+    from their API long names and the current bindPreMatrix sources from one
+    listConnections on the bindPreMatrix plugs.
+
+    Args:
+        clusters (list, optional): clusters, all of the clusters group if
+            not provided
+
+    Return:
+        dict: {cluster: {"handle", "parent", "input_plug", "dest_plug",
+            "connected"}}, connected is the current bindPreMatrix source plug
+    """
+    if clusters is None:
+        clusters = get_clusters()
+    if not clusters:
+        return {}
+
+    matrix_connections = (
+        cmds.listConnections(
+            [f"{x}.matrix" for x in clusters],
+            source=True,
+            destination=False,
+            connections=True,
+        )
+        or []
+    )
+    handles = {
+        plug.rsplit(".", 1)[0]: handle
+        for plug, handle in zip(
+            matrix_connections[::2], matrix_connections[1::2]
+        )
+    }
+
+    bpm_connections = (
+        cmds.listConnections(
+            [f"{x}.bindPreMatrix" for x in clusters],
+            source=True,
+            destination=False,
+            connections=True,
+            plugs=True,
+        )
+        or []
+    )
+    connected = dict(zip(bpm_connections[::2], bpm_connections[1::2]))
+
+    long_names = {
+        handle: geometry.get_dag_path(handle).fullPathName()
+        for handle in set(handles.values())
+    }
+
+    graph = {}
+    for cluster, handle in handles.items():
+        parent = long_names[handle].rsplit("|", 1)[0] or None
+        dest_plug = f"{cluster}.bindPreMatrix"
+        graph[cluster] = {
+            "handle": handles[cluster],
+            "parent": parent,
+            "input_plug": f"{parent}.worldInverseMatrix[0]"
+            if parent
+            else None,
+            "dest_plug": dest_plug,
+            "connected": connected.get(dest_plug),
+        }
+
+    for cluster in clusters:
+        if cluster not in graph:
+            cmds.warning(f"No handle found for {cluster}", noContext=True)
 
-    return clusters
+    return graph
 
 
 def get_controllers():
@@ -1197,6 +2103,106 @@ def get_deformers(mesh, types):
     return deformers, deformers_types
 
 
+def get_influences_mapping(influences, globs=MIRROR_INFLUENCE_GLOBS):
+    """Build a mirror mapping between influence names from glob rules
+
+    The result is cached by (sorted influences, globs) so meshes sharing the
+    same influence list only compute it once.
+
+    Args:
+        influences (list): influence names
+        globs (list): pairs of glob patterns, mapped both ways
+
+    Return:
+        dict: {influence: mirrored influence}, unmatched map to themselves
+    """
+    key = (tuple(sorted(influences)), tuple(tuple(g) for g in globs))
+    mapping = _INFLUENCES_MAPPING_CACHE.get(key)
+    if mapping is not None:
+        return mapping
+
+    rules = []
+    for source, destination in globs:
+        for src, dst in ((source, destination), (destination, source)):
+            regex = "^" + "(.*)".join(re.escape(x) for x in src.split("*"))
+            rules.append((re.compile(regex + "$"), dst))
+
+    names = set(influences)
+    mapping = {}
+    for influence in influences:
+        mapping[influence] = influence
+        for regex, dst in rules:
+            match = regex.match(influence)
+            if not match:
+                continue
+            tokens = dst.split("*")
+            groups = match.groups()
+            if len(groups) != len(tokens) - 1:
+                continue
+            mirrored = tokens[0] + "".join(
+                g + t for g, t in zip(groups, tokens[1:])
+            )
+            if mirrored in names:
+                mapping[influence] = mirrored
+                break
+
+    _INFLUENCES_MAPPING_CACHE[key] = mapping
+    return mapping
+
+
+def get_unused_nodes(node_types=UNUSED_SWEEP_NODE_TYPES):
+    """Find the utility nodes whose outputs reach no other kind of node
+
+    The outgoing connections of every candidate are read in one query.
+    Any node which is not a candidate is a root (DAG shapes, controllers,
+    deformers, shading engines...), candidates feeding a root are used and
+    usage is propagated upstream through the candidates feeding them.
+    Default and referenced nodes are never candidates.
+
+    Args:
+        node_types (list): node types allowed to be swept
+
+    Return:
+        list: unused nodes, sorted
+    """
+    candidates = set(cmds.ls(type=node_types) or [])
+    if not candidates:
+        return []
+    candidates -= set(cmds.ls(defaultNodes=True) or [])
+    candidates -= set(cmds.ls(list(candidates), referencedNodes=True) or [])
+    if not candidates:
+        return []
+
+    connections = (
+        cmds.listConnections(
+            list(candidates),
+            source=False,
+            destination=True,
+            connections=True,
+            skipConversionNodes=False,
+        )
+        or []
+    )
+
+    used = set()
+    feeders = {}
+    for plug, destination in zip(connections[::2], connections[1::2]):
+        node = plug.split(".", 1)[0]
+        if destination in candidates:
+            feeders.setdefault(destination, set()).add(node)
+        else:
+            used.add(node)
+
+    stack = list(used)
+    while stack:
+        for source in feeders.get(stack.pop(), ()):
+            if source not in used:
+                used.add(source)
+                stack.append(source)
+
+    return sorted(candidates - used)
+
+
 def import_skinning_weights(mesh, directory):
     deformers, types = list_deformers(mesh, types=["skinCluster"])
     if not deformers:
@@ -1213,6 +2219,18 @@ def import_skinning_weights(mesh, directory):
         )
 
 
+def increment_multi_index(plug, offset=1):
+    """Shift the first multi index of a plug
+
+    "input3D[1].input3Dx" becomes "input3D[2].input3Dx" with offset 1.
+    """
+    match = re.search(r"\[(\d+)\]", plug)
+    number = int(match.group(1)) + offset
+    return "{}[{}]{}".format(
+        plug[: match.start()], number, plug[match.end() :]
+    )
+
+
 def is_controller(obj):
     shapes = cmds.listRelatives(obj, shapes=True, fullPath=True) or []
     for shape in shapes:
@@ -1321,7 +2339,13 @@ def mirror_obj(
 
 
 def mirror_cvs(cvs, mode="x", replaces=("L_", "R_")):
+    if isinstance(cvs, components.ComponentSet):
+        cvs = [cvs]
     for cv in cvs:
+        if isinstance(cv, components.ComponentSet):
+            mirror_component_set(cv, mode, replaces)
+            continue
+
         pos = cmds.xform(cv, q=1, ws=1, t=1)
         cv_side = cv.replace(replaces[0], replaces[1], 1)
         if not cmds.objExists(cv_side):
@@ -1333,6 +2357,47 @@ def mirror_cvs(cvs, mode="x", replaces=("L_", "R_")):
             cmds.xform(cv_side, ws=1, t=[pos[0], pos[1], pos[2] * (-1)])
 
 
+def mirror_component_set(component_set, mode="x", replaces=("L_", "R_")):
+    """Mirror curve CVs onto the other side node in a few bulk calls
+
+    World positions are read in one xform query, mirrored and written back
+    in local space with one setAttr per index range.
+    """
+    if component_set.kind != "cv":
+        strings = cmds.ls(component_set.to_strings(), flatten=True)
+        mirror_cvs(strings, mode=mode, replaces=replaces)
+        return
+
+    node_side = component_set.node.replace(replaces[0], replaces[1], 1)
+    if not cmds.objExists(node_side) or not len(component_set):
+        return
+
+    positions = cmds.xform(
+        component_set.to_strings(),
+        query=True,
+        translation=True,
+        worldSpace=True,
+    )
+    positions = np.reshape(positions, (-1, 3))
+    positions[:, "xyz".index(mode)] *= -1
+
+    inverse = np.reshape(
+        cmds.getAttr(node_side + ".worldInverseMatrix[0]"), (4, 4)
+    )
+    positions = np.hstack((positions, np.ones((len(positions), 1))))
+    positions = (positions @ inverse)[:, :3]
+
+    side = components.ComponentSet(
+        node_side, component_set.kind, component_set.indices
+    )
+    offset = 0
+    for (start, end), plug in zip(side.ranges(), side.to_strings()):
+        count = end - start + 1
+        values = positions[offset : offset + count].ravel().tolist()
+        cmds.setAttr(plug, *values)
+        offset += count
+
+
 def mirror_controllers(search="L_" + CTRLS_SEARCH, replaces=("L_", "R_")):
     double_offsets = []
     point_constraints = []
@@ -1370,7 +2435,7 @@ def mirror_controllers(search="L_" + CTRLS_SEARCH, replaces=("L_", "R_")):
         mirror_obj(obj, replaces=replaces, invert=True)
 
     for ctrl in controllers:
-        ctrl_cvs = cmds.ls(f"{ctrl}.cv[*]", flatten=True)
+        ctrl_cvs = components.ComponentSet.all(ctrl, "cv")
         mirror_cvs(ctrl_cvs, replaces=replaces)
 
     cmds.inViewMessage(
@@ -1424,30 +2489,89 @@ def mirror_joints(search="M_base_*_jnt_offset", replaces=("L_", "R_")):
 
 
 def mirror_ng_layers():
-    # ng config
-    config = api.InfluenceMappingConfig.transfer_defaults()
-    config.globs = [
-        ("L_*", "R_*"),
-        ("l_*", "r_*"),
-        ("lf_*", "rt_*"),
-        ("*_lf", "*_rt"),
-        ("M_*L_*", "M_*R_*"),
-        ("M_*M_*", "M_*M_*"),
-    ]
-    config.use_label_matching = False
-    config.use_distance_matching = False
-    config.use_name_matching = True
+    return mirror_ng_layers_batch(get_selection())
 
-    meshes = get_selection()
+
+def mirror_ng_layers_batch(meshes, globs=MIRROR_INFLUENCE_GLOBS):
+    """Mirror all ngSkinTools layers of many meshes
+
+    The influences mapping is shared between meshes with the same influences.
+
+    Return:
+        dict: {mesh: duration in seconds}
+    """
+    timings = {}
     for mesh in meshes:
+        mesh_start = time.perf_counter()
         skincluster, types = list_deformers(mesh, types=["skinCluster"])
-        mirror = api.Mirror(skincluster)
-        mirror.recalculate_influences_mapping()
+        if not skincluster:
+            cmds.warning(f"No skinCluster found on {mesh}", noContext=True)
+            continue
+
+        influences = get_skincluster_influences(skincluster[0])
+        mapping = get_influences_mapping(list(influences), globs)
+
+        mirror = api.Mirror(skincluster[0])
+        mirror.set_influences_mapping({
+            influences[src]: influences[dst] for src, dst in mapping.items()
+        })
 
         layer_data = api.init_layers(mesh)
         for layer in layer_data.list():
+            layer_start = time.perf_counter()
             layer.set_current()
             mirror.mirror(api.MirrorOptions())
+            print(
+                "  {} | {}: {:.3f}s".format(
+                    mesh, layer.name, time.perf_counter() - layer_start
+                )
+            )
+
+        timings[mesh] = time.perf_counter() - mesh_start
+        print("{}: {:.3f}s".format(mesh, timings[mesh]))
+
+    print(
+        "Mirrored {} meshes in {:.3f}s".format(
+            len(timings), sum(timings.values())
+        )
+    )
+
+    return timings
+
+
+def reconnect_clusters_bpm(clusters=None, graph=None):
+    """Connect the handle parent worldInverseMatrix to the bindPreMatrix
+
+    Inverse of disconnect_clusters_bpm, from the same clusters graph. Other
+    bindPreMatrix sources are replaced, every connection is done by one
+    MDGModifier.
+
+    Args:
+        clusters (list, optional): clusters, all of the clusters group if
+            not provided
+        graph (dict, optional): result of get_clusters_graph
+
+    Return:
+        dict: the clusters graph
+    """
+    if graph is None:
+        graph = get_clusters_graph(clusters)
+
+    modifier = om.MDGModifier()
+    for data in graph.values():
+        if not data["input_plug"]:
+            continue
+        source = geometry.get_plug(data["input_plug"])
+        dest = geometry.get_plug(data["dest_plug"])
+        current = dest.source()
+        if not current.isNull:
+            if current == source:
+                continue
+            modifier.disconnect(current, dest)
+        modifier.connect(source, dest)
+    modifier.doIt()
+
+    return graph
 
 
 def rebuild_blendshape_target(blendshape, index):
@@ -1463,6 +2587,18 @@ def rebuild_blendshape_target(blendshape, index):
     return target[0]
 
 
+def remove_data_structures():
+    """Remove every data structure definition stored in the scene
+
+    Return:
+        list: removed structures
+    """
+    structures = cmds.dataStructure(query=True) or []
+    cmds.dataStructure(removeAll=True)
+
+    return structures
+
+
 def reset_transforms(
     obj,
     reset_attrs=("translate", "rotate", "scale"),
@@ -1549,6 +2685,30 @@ def reset_all_controllers(user_attr=True):
         reset_user_attributes(ctrl)
 
 
+def reset_remap(remap):
+    """Zero the ranges of a remapValue, its ramp keys get 0 and 1 for the last
+
+    The ramp keys are read once and written back whole, consecutive keys
+    in one ranged setAttr.
+    """
+    data = {
+        "{}.{}".format(remap, attr): 0
+        for attr in ["inputMin", "inputMax", "outputMin", "outputMax"]
+    }
+    indices = get_multi_indices("{}.value".format(remap))
+    keys = cmds.getAttr("{}.value".format(remap)) if indices else []
+    for i, (index, key) in enumerate(zip(indices, keys)):
+        position, _, interpolation = key
+        value = 1 if i == len(indices) - 1 else 0
+        data["{}.value[{}]".format(remap, index)] = (
+            position,
+            value,
+            interpolation,
+        )
+
+    set_plugs(data)
+
+
 def reset_cvs_to_local_axis():
     """
     Resets the CV positions by applying the pivot offset.
@@ -1611,14 +2771,76 @@ def set_current_value_as_default():
                 )
 
 
+def _get_axis_parent(plug):
+    """Compound of an axis child plug
+
+    "node.translateX" gives "node.translate" and
+    "pma.input3D[0].input3Dx" gives "pma.input3D[0]".
+    """
+    if "." in plug.split(".", 1)[1]:
+        return plug.rsplit(".", 1)[0]
+    return plug[:-1]
+
+
+def set_plugs(data):
+    """Dict {plug: value}, sequence values set compound plugs
+
+    Values are grouped to save setAttr calls: the 3 axis children of an
+    existing compound are set on the compound, consecutive indices of a
+    multi attribute with values of the same size as one index range.
+    """
+    data = dict(data)
+    scalar = (int, float)
+
+    for plug in list(data):
+        for suffix in ("XYZ", "xyz"):
+            children = [plug[:-1] + axis for axis in suffix]
+            parent = _get_axis_parent(plug)
+            if plug != children[0] or parent in data:
+                continue
+            values = [data.get(x) for x in children]
+            if not all(isinstance(x, scalar) for x in values):
+                continue
+            if not cmds.objExists(parent):
+                continue
+            for child in children:
+                del data[child]
+            data[parent] = values
+
+    multis = {}
+    for plug, value in list(data.items()):
+        match = MULTI_INDEX_PATTERN.match(plug)
+        if not match:
+            continue
+        values = list(value) if isinstance(value, (list, tuple)) else [value]
+        key = (match.group(1), len(values))
+        multis.setdefault(key, []).append((int(match.group(2)), values))
+        del data[plug]
+
+    for (attr, _), items in multis.items():
+        items.sort()
+        start = 0
+        for i in range(1, len(items) + 1):
+            if i < len(items) and items[i][0] == items[i - 1][0] + 1:
+                continue
+            run = items[start:i]
+            indices = "{}:{}".format(run[0][0], run[-1][0])
+            values = [x for _, item_values in run for x in item_values]
+            cmds.setAttr("{}[{}]".format(attr, indices), *values)
+            start = i
+
+    for plug, value in data.items():
+        if isinstance(value, (list, tuple)):
+            cmds.setAttr(plug, *value)
+        else:
+            cmds.setAttr(plug, value)
+
+
 def selection_to_cvs():
-    selection = get_selection()
-    all_cvs = []
-    for obj in selection:
-        shape = get_shape(obj)
-        cvs = cmds.ls(shape + ".cv[*]", flatten=True)
-        all_cvs.extend(cvs)
-    cmds.select(all_cvs)
+    cvs = []
+    for obj in get_selection():
+        cvs.extend(components.ComponentSet.all(get_shape(obj), "cv"))
+    cmds.select(components.to_strings(cvs))
 
 
 def setup_ng_custom_hotkeys():
@@ -1641,6 +2863,19 @@ def setup_ng_custom_hotkeys():
         cmds.hotkeySet("ngSkinTools2", edit=True, current=True)
 
 
+def split_evenly(items, count):
+    """Split items in count consecutive chunks, sizes differ by 1 at most"""
+    size, remainder = divmod(len(items), count)
+    chunks = []
+    start = 0
+    for i in range(count):
+        end = start + size + (i < remainder)
+        chunks.append(items[start:end])
+        start = end
+
+    return chunks
+
+
 def transfer_points_weights(points, target_points):
     for point in points:
         cmds.select(point)
@@ -1664,49 +2899,6 @@ def transfer_points_weights_from_sel():
     transfer_points_weights(source_points, target_points)
 
 
-def transfer_skincluster_to_mirrored_mesh(
-    mesh, target, method="closestPoint", keep_layers=False
-):
-    # ng config
-    infl_config = api.InfluenceMappingConfig.transfer_defaults()
-    infl_config.globs = [
-        ("L_*", "R_*"),
-        ("l_*", "r_*"),
-        ("lf_*", "rt_*"),
-        ("*_lf", "*_rt"),
-        ("M_*", "M_*"),
-    ]
-    infl_config.use_label_matching = False
-    infl_config.use_distance_matching = False
-    infl_config.use_name_matching = True
-
-    # mirror mesh
-    cmds.setAttr("{}.scaleX".format(mesh), lock=False)
-    cmds.setAttr("{}.scaleX".format(mesh), -1, lock=True)
-
-    # transfer skinCluster
-    skincluster, types = list_deformers(target, types=["skinCluster"])
-    if skincluster and not keep_layers:
-        cmds.select(target)
-        cmds.DetachSkin()
-
-    cmds.select(mesh, target)
-    copy_skincluster_callback(method="closestPoint")
-
-    t = api.transfer.LayersTransfer()
-    t.source = mesh
-    t.target = target
-    t.vertex_transfer_mode = method
-    t.influences_mapping.config = infl_config
-    t.keep_existing_layers = keep_layers
-
-    t.execute()
-
-    # restore mesh
-    cmds.setAttr("{}.scaleX".format(mesh), lock=False)
-    cmds.setAttr("{}.scaleX".format(mesh), 1, lock=True)
-
-
 def transfer_ng_layers(method="closestPoint", keep_layers=False):
     # ng config
     infl_config = api.InfluenceMappingConfig.transfer_defaults()
@@ -1755,20 +2947,27 @@ def xform_match_transforms(
 def xform_average_match_transforms(
     target, sources, attrs=("translation", "rotation", "scale")
 ):
+    vertex_sources = [x for x in sources if ".vtx[" in x]
+    vertices, others = geometry.parse_components(vertex_sources)
     for attr in attrs:
         if attr not in {"translation", "rotation", "scale"}:
             continue
 
-        summed_pos = [0.0, 0.0, 0.0]
-        for source in sources:
-            pos = cmds.xform(
-                source,
-                query=True,
-                **{attr: True},
-                worldSpace=True,
+        values = []
+        xform_sources = sources
+        if attr == "translation":
+            values = [
+                geometry.get_points(node, indices, world_space=True)
+                for (node, kind), indices in vertices.items()
+            ]
+            xform_sources = [x for x in sources if ".vtx[" not in x]
+            xform_sources += others
+
+        for source in xform_sources:
+            values.append(
+                cmds.xform(source, query=True, **{attr: True}, worldSpace=True)
             )
-            summed_pos = [sum_val + p for sum_val, p in zip(summed_pos, pos)]
 
-        count = len(sources)
-        avg_pos = [val / count for val in summed_pos]
+        values = np.concatenate([np.reshape(v, (-1, 3)) for v in values])
+        avg_pos = values.mean(axis=0).tolist()
         cmds.xform(target, **{attr: avg_pos}, worldSpace=True)